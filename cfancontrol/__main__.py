@@ -24,6 +24,8 @@ def parse_settings() -> argparse.Namespace:
     parser.add_argument("-l", "--loglevel", type=int, action="store", dest="log_level",
                         choices=[logging.NOTSET, logging.DEBUG, logging.INFO, logging.WARN, logging.ERROR],
                         default=logging.INFO, help="log level")
+    parser.add_argument("-d", "--discovery", type=str, action="store", dest="sensor_discovery", choices=["libsensors", "sysfs"],
+                        default="libsensors", help="discovery of hwmon sensors (via libsensors or directly from sysfs)")
     parser.add_argument("-t", "--theme", type=str, action="store", dest="theme", choices=["light", "dark", "system"], default="system", help="application theme")
     parser.add_argument("-s", action="store_true", dest="load_settings", help="load settings from file")
 
@@ -0,0 +1,88 @@
+import threading
+import time
+from typing import Dict, Optional
+
+from .log import LogManager
+
+
+class DeviceUnavailableError(Exception):
+    pass
+
+
+class CircuitBreaker(object):
+
+    CLOSED: str = 'closed'
+    OPEN: str = 'open'
+    HALF_OPEN: str = 'half-open'
+
+    # shared settings (a threshold of 0 disables all breakers)
+    threshold: int = 3
+    delay: float = 2.0
+    max_delay: float = 120.0
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.state = self.CLOSED
+        self.failure_count = 0
+        self.open_count = 0
+        self.rejected_count = 0
+        self._lock = threading.Lock()
+        self._retry_delay = 0.0
+        self._retry_at = 0.0
+
+    @staticmethod
+    def configure(threshold: int, delay: float, max_delay: float) -> None:
+        CircuitBreaker.threshold = threshold
+        CircuitBreaker.delay = delay
+        CircuitBreaker.max_delay = max_delay
+
+    def is_available(self, now: Optional[float] = None) -> bool:
+        # closed, or open and due for the next probe
+        if self.state == self.CLOSED or CircuitBreaker.threshold <= 0:
+            return True
+        if self.state == self.OPEN:
+            return (now or time.monotonic()) >= self._retry_at
+        return False
+
+    def is_open(self) -> bool:
+        return self.state != self.CLOSED
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED or CircuitBreaker.threshold <= 0:
+                return True
+            if self.state == self.OPEN and time.monotonic() >= self._retry_at:
+                # let a single probe through
+                self.state = self.HALF_OPEN
+                LogManager.logger.debug(f"Probing unavailable source {repr({'name': self.name, 'failures': self.failure_count})}")
+                return True
+            self.rejected_count += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                LogManager.logger.info(f"Source available again {repr({'name': self.name, 'failures': self.failure_count})}")
+            self.state = self.CLOSED
+            self.failure_count = 0
+            self._retry_delay = 0.0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failure_count += 1
+            if self.state == self.HALF_OPEN:
+                # failed probe: wait twice as long for the next one
+                self._open(min(self._retry_delay * 2, CircuitBreaker.max_delay))
+            elif self.state == self.CLOSED and 0 < CircuitBreaker.threshold <= self.failure_count:
+                self.open_count += 1
+                LogManager.logger.warning(f"Source unavailable - skipping it until it responds again {repr({'name': self.name, 'failures': self.failure_count, 'retry': CircuitBreaker.delay})}")
+                self._open(CircuitBreaker.delay)
+
+    def get_statistics(self) -> Dict[str, float]:
+        return {'state': self.state, 'failures': self.failure_count, 'opened': self.open_count, 'rejected': self.rejected_count,
+                'retry in': max(0.0, self._retry_at - time.monotonic()) if self.state == self.OPEN else 0.0}
+
+    def _open(self, retry_delay: float) -> None:
+        self.state = self.OPEN
+        self._retry_delay = retry_delay
+        self._retry_at = time.monotonic() + retry_delay
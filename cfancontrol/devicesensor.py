@@ -1,4 +1,3 @@
-import threading
 from typing import ContextManager, Optional
 
 from liquidctl.driver.kraken3 import KrakenX3
@@ -6,6 +5,9 @@ from liquidctl.driver.hydro_platinum import HydroPlatinum
 
 from .sensor import Sensor
 from .log import LogManager
+from .settings import Config
+from .devicesession import DeviceSession, DeviceRegistry, PRIORITY_STATUS
+from .breaker import DeviceUnavailableError
 
 
 class AIODeviceSensor(Sensor, ContextManager):
@@ -17,9 +19,9 @@ class AIODeviceSensor(Sensor, ContextManager):
 
     def __init__(self) -> None:
         super().__init__()
-        self._lock = threading.Lock()
         self.is_valid = False
         self.current_temp = 0.0
+        self._session: Optional[DeviceSession] = None
         # self.sensor_name = device_name
         if not hasattr(self, "device"):
             self.device = None
@@ -28,6 +30,9 @@ class AIODeviceSensor(Sensor, ContextManager):
                 self.device.connect()
                 self.is_valid = True
                 self.device.disconnect()
+                self._session = DeviceRegistry.get_session(self.device, self.sensor_name)
+                # use the device object of the shared session
+                self.device = self._session.device
                 LogManager.logger.info(f"AIO device initialized {repr({'device': self.sensor_name})}")
             except BaseException:
                 self.is_valid = False
@@ -35,13 +40,15 @@ class AIODeviceSensor(Sensor, ContextManager):
 
     def __enter__(self):
         if self.device:
+            if self.is_valid:
+                self._session.open()
             return self
         else:
             return None
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.is_valid:
-            self.device.disconnect()
+            self._session.close()
             del self.device
             self.is_valid = False
             LogManager.logger.debug(f"AIO Device disconnected and reference removed {repr({'device': self.sensor_name})}")
@@ -53,17 +60,13 @@ class AIODeviceSensor(Sensor, ContextManager):
     def get_signature(self) -> list:
         raise NotImplementedError()
 
-    def _safe_call_aio_function(self, function):
-        self._lock.acquire()
-        try:
-            self.device.connect()
-            result = function()
-        except Exception:
-            raise
-        finally:
-            self.device.disconnect()
-            self._lock.release()
-        return result
+    def get_reconnect_count(self) -> int:
+        if self._session:
+            return self._session.get_reconnect_count()
+        return 0
+
+    def _safe_call_aio_function(self, function, key: Optional[str] = None):
+        return self._session.call(function, PRIORITY_STATUS, key)
 
 
 class KrakenX3Sensor(AIODeviceSensor):
@@ -78,16 +81,21 @@ class KrakenX3Sensor(AIODeviceSensor):
         self.current_temp = 0.0
         if self.is_valid:
             try:
-                ret = self._safe_call_aio_function(lambda: self.device._read())
+                ret = self._safe_call_aio_function(lambda: self.device._read(), key="status")
                 part1 = int(ret[15])
                 part2 = int(ret[16])
                 if (0 <= part1 <= 100) and (0 <= part2 <= 90):
                     self.current_temp = float(part1) + float(part2 / 10)
+                    self._set_updated()
                     LogManager.logger.trace(f"Getting sensor temperature {repr({'sensor': self.sensor_name, 'temperature': round(self.current_temp, 1)})}")
                 else:
                     LogManager.logger.warning(f"Invalid sensor data {repr({'sensor': self.sensor_name, 'part 1': part1, 'part 2': part2})}")
+            except DeviceUnavailableError:
+                LogManager.logger.trace(f"Skipping unavailable device {repr({'sensor': self.sensor_name})}")
+                self._set_failed()
             except BaseException:
                 LogManager.logger.exception(f"Unexpected error in getting sensor data {repr({'sensor': self.sensor_name})}")
+                self._set_failed()
         return self.current_temp
 
     def get_signature(self) -> list:
@@ -108,18 +116,24 @@ class HydroPlatinumSensor(AIODeviceSensor):
         self.current_temp = 0.0
         if self.is_valid:
             try:
-                ret = self._safe_call_aio_function(lambda: self.device._send_command(0b00, 0xff))
+                ret = self._session.call_cached("status", lambda: self.device._send_command(0b00, 0xff), Config.device_status_ttl)
                 part1 = int(ret[8])
                 part2 = int(ret[7])
                 if (0 <= part1 <= 100) and (0 <= part2 <= 255):
                     self.current_temp = float(part1) + float(part2 / 255)
+                    self._set_updated()
                     LogManager.logger.trace(f"Getting sensor temperature {repr({'sensor': self.sensor_name, 'temperature': round(self.current_temp, 1)})}")
                 else:
                     LogManager.logger.warning(f"Invalid sensor data {repr({'sensor': self.sensor_name, 'part 1': part1, 'part 2': part2})}")
+            except DeviceUnavailableError:
+                LogManager.logger.trace(f"Skipping unavailable device {repr({'sensor': self.sensor_name})}")
+                self._set_failed()
             except ValueError as verr:
                 LogManager.logger.error(f"Problem in getting sensor data {repr({'sensor': self.sensor_name, 'error': repr(verr)})}")
+                self._set_failed()
             except BaseException:
                 LogManager.logger.exception(f"Unexpected error in getting sensor data {repr({'sensor': self.sensor_name})}")
+                self._set_failed()
         return self.current_temp
 
     def get_signature(self) -> list:
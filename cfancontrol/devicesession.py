@@ -0,0 +1,224 @@
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Optional, Tuple
+
+from .log import LogManager
+from .breaker import CircuitBreaker, DeviceUnavailableError
+
+# order in which the I/O worker of a device serves pending calls
+PRIORITY_EMERGENCY: int = 0
+PRIORITY_SETPOINT: int = 1
+PRIORITY_STATUS: int = 2
+
+
+class DeviceCall(object):
+
+    def __init__(self, function, priority: int, key: Optional[str]) -> None:
+        self.function = function
+        self.priority = priority
+        self.key = key
+        self.future: Future = Future()
+        self.queued = time.monotonic()
+
+
+class DeviceSession(object):
+
+    device: Optional[any]
+    device_name: str
+    is_open: bool
+    is_connected: bool
+    reconnect_count: int
+
+    def __init__(self, device, device_name: str) -> None:
+        self._lock = threading.RLock()
+        self._connection_lost = False
+        self.device = device
+        self.device_name = device_name
+        self.is_open = False
+        self.is_connected = False
+        self.reconnect_count = 0
+        self.cache_hits = 0
+        self._open_count = 0
+        self._cache_lock = threading.Lock()
+        self._cache: Dict[str, Tuple[float, any]] = dict()
+        # all device I/O runs on one worker thread that serves a priority queue
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._pending: Dict[str, DeviceCall] = dict()
+        self._pending_lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self.breaker = CircuitBreaker(device_name)
+        self.call_count = 0
+        self.coalesced_count = 0
+        self.max_queue_depth = 0
+        self.last_wait = 0.0
+        self.max_wait = 0.0
+
+    def open(self) -> None:
+        # keep the device connected until the last user closed the session
+        with self._lock:
+            self._open_count += 1
+            if not self.is_open:
+                self.is_open = True
+                LogManager.logger.debug(f"Device session opened {repr({'device': self.device_name})}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._open_count = max(0, self._open_count - 1)
+            if self._open_count == 0 and self.is_open:
+                self.is_open = False
+                with self._cache_lock:
+                    self._cache.clear()
+                self._disconnect()
+                LogManager.logger.debug(f"Device session closed {repr({'device': self.device_name, 'reconnects': self.reconnect_count})}")
+
+    def call(self, function, priority: int = PRIORITY_STATUS, key: Optional[str] = None):
+        if threading.current_thread() is self._worker:
+            # nested call from the worker itself
+            return self._execute(function)
+        return self.submit(function, priority, key).result()
+
+    def submit(self, function, priority: int = PRIORITY_STATUS, key: Optional[str] = None) -> Future:
+        with self._pending_lock:
+            if key is not None:
+                # a read that is already queued serves all callers
+                pending = self._pending.get(key)
+                if pending is not None:
+                    self.coalesced_count += 1
+                    return pending.future
+            device_call = DeviceCall(function, priority, key)
+            if not self.breaker.allow():
+                # fail fast while the device does not respond
+                device_call.future.set_exception(DeviceUnavailableError(self.device_name))
+                return device_call.future
+            if key is not None:
+                self._pending[key] = device_call
+            self._start_worker()
+            self._queue.put((priority, next(self._sequence), device_call))
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return device_call.future
+
+    def call_cached(self, key: str, function, ttl: float):
+        # reports that are read by several users of the device are shared for a short time
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None and time.monotonic() - cached[0] < ttl:
+                self.cache_hits += 1
+                return cached[1]
+        result = self.call(function, PRIORITY_STATUS, key)
+        with self._cache_lock:
+            self._cache[key] = (time.monotonic(), result)
+        return result
+
+    def get_reconnect_count(self) -> int:
+        return self.reconnect_count
+
+    def is_available(self) -> bool:
+        return self.breaker.is_available()
+
+    def get_queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def get_statistics(self) -> Dict[str, float]:
+        return {'calls': self.call_count, 'coalesced': self.coalesced_count, 'cache hits': self.cache_hits, 'breaker': self.breaker.state,
+                'depth': self.get_queue_depth(), 'max depth': self.max_queue_depth, 'wait': self.last_wait, 'max wait': self.max_wait}
+
+    def _start_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="cfancontrol-device-io", daemon=True)
+            self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            _, _, device_call = self._queue.get()
+            with self._pending_lock:
+                if device_call.key is not None and self._pending.get(device_call.key) is device_call:
+                    del self._pending[device_call.key]
+            wait = time.monotonic() - device_call.queued
+            self.call_count += 1
+            self.last_wait = wait
+            self.max_wait = max(self.max_wait, wait)
+            if not device_call.future.set_running_or_notify_cancel():
+                continue
+            try:
+                device_call.future.set_result(self._execute(device_call.function))
+            except BaseException as err:
+                device_call.future.set_exception(err)
+
+    def _execute(self, function):
+        try:
+            result = self._execute_connected(function)
+        except BaseException:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def _execute_connected(self, function):
+        with self._lock:
+            if not self.is_open:
+                # no persistent session: connect for a single call only
+                try:
+                    self._connect()
+                    return function()
+                finally:
+                    self._disconnect()
+            if not self.is_connected:
+                self._connect()
+            try:
+                return function()
+            except OSError:
+                # drop the connection and reconnect lazily with the next call
+                LogManager.logger.warning(f"I/O error on device - reconnecting with next call {repr({'device': self.device_name})}")
+                self._connection_lost = True
+                with self._cache_lock:
+                    self._cache.clear()
+                self._disconnect()
+                raise
+
+    def _connect(self) -> None:
+        self.device.connect()
+        self.is_connected = True
+        if self._connection_lost:
+            self._connection_lost = False
+            self.reconnect_count += 1
+            LogManager.logger.info(f"Device reconnected {repr({'device': self.device_name, 'reconnects': self.reconnect_count})}")
+
+    def _disconnect(self) -> None:
+        self.is_connected = False
+        try:
+            self.device.disconnect()
+        except BaseException:
+            LogManager.logger.debug(f"Error in disconnecting device {repr({'device': self.device_name})}")
+
+
+class DeviceRegistry(object):
+    # one session per physical device, shared by all sensors and controllers of that device
+    sessions: Dict[Tuple, DeviceSession] = dict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_session(device, device_name: str) -> DeviceSession:
+        key = DeviceRegistry.get_device_key(device)
+        with DeviceRegistry._lock:
+            session = DeviceRegistry.sessions.get(key)
+            if session is None:
+                session = DeviceSession(device, device_name)
+                DeviceRegistry.sessions[key] = session
+            else:
+                LogManager.logger.debug(f"Sharing device session {repr({'device': device_name, 'session': session.device_name})}")
+            return session
+
+    @staticmethod
+    def get_device_key(device) -> Tuple:
+        address = getattr(device, "address", None)
+        if address:
+            return getattr(device, "bus", None), address
+        return "object", id(device)
+
+    @staticmethod
+    def get_statistics() -> Dict[str, Dict[str, float]]:
+        return {session.device_name: session.get_statistics() for session in DeviceRegistry.sessions.values()}
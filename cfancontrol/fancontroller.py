@@ -1,21 +1,38 @@
-import threading
+import os
+import re
 import time
-from typing import Dict, Optional, List, ContextManager
+from types import MappingProxyType
+from typing import Dict, Optional, List, ContextManager, Mapping, NamedTuple, Tuple
 
 import liquidctl.driver.commander_pro
 import liquidctl.driver.hydro_platinum
 from liquidctl import find_liquidctl_devices
 
 from .log import LogManager
+from .settings import Config
+from .devicesession import DeviceSession, DeviceRegistry, PRIORITY_EMERGENCY, PRIORITY_SETPOINT, PRIORITY_STATUS
+from .breaker import CircuitBreaker, DeviceUnavailableError
+from .hwmon import HwmonChip, HwmonDiscovery, HWMON_ROOT
+from .hwsensor import SysfsFile
+from .ramp import RampScheduler
 from .pwmfan import PWMFan
-from .fancurve import FanCurve, FanMode
+from .fancurve import FanCurve, FanMode, MAXPERCENTAGE
 from .sensor import Sensor, DummySensor
 
 
+class SpeedSnapshot(NamedTuple):
+    timestamp: float
+    speeds: Mapping[str, int]
+
+    def get_speed(self, channel: str) -> int:
+        return self.speeds.get(channel, 0)
+
+
 class FanController(ContextManager):
 
-    RPM_STEP: int = 10
-    RPM_INTERVAL: float = 0.025
+    STOP_TIMEOUT: float = 5.0
+    # class names of other backends for the same device, so profiles can be shared
+    profile_aliases: Tuple[str, ...] = ()
 
     channels: Dict[str, PWMFan]
     is_valid: bool
@@ -23,9 +40,9 @@ class FanController(ContextManager):
     device_name: str
 
     def __init__(self):
-        self._lock = threading.Lock()
         self.channels = {}
         self.is_valid = False
+        self._session: Optional[DeviceSession] = None
         if not hasattr(self, "device"):
             self.device = None
             self.device_name = "<none>"
@@ -34,6 +51,9 @@ class FanController(ContextManager):
                 self.device_name = self.device.description
                 self.device.connect()
                 self.device.disconnect()
+                self._session = DeviceRegistry.get_session(self.device, self.device_name)
+                # use the device object of the shared session
+                self.device = self._session.device
                 self.is_valid = True
                 self.detect_channels()
                 LogManager.logger.info(f"Fan controller initialized {repr({'controller': self.device_name})}")
@@ -42,16 +62,20 @@ class FanController(ContextManager):
                 LogManager.logger.exception(f"Error in initializing fan controller {repr({'controller': self.device_name})}")
             finally:
                 self.device.disconnect()
+        self._ramp_scheduler = RampScheduler(self.device_name, self._write_channel_duty, Config.ramp_step, Config.ramp_duration, self._on_ramp_failed)
 
     def __enter__(self):
         if self.device:
+            if self.is_valid:
+                self._session.open()
             return self
         else:
             return None
 
     def __exit__(self, exc_type, exc_value, exc_tb):
+        self._ramp_scheduler.stop()
         if self.is_valid:
-            self.device.disconnect()
+            self._session.close()
             del self.device
             self.is_valid = False
             LogManager.logger.debug(f"Fan controller disconnected and reference removed {repr({'controller': self.device_name})}")
@@ -62,6 +86,20 @@ class FanController(ContextManager):
     def is_initialized(self) -> bool:
         return self.is_valid
 
+    def get_reconnect_count(self) -> int:
+        if self._session:
+            return self._session.get_reconnect_count()
+        return 0
+
+    def is_available(self) -> bool:
+        # false while the device keeps failing and the next probe is not due yet
+        return self._session is None or self._session.is_available()
+
+    def get_breaker(self) -> Optional[CircuitBreaker]:
+        if self._session:
+            return self._session.breaker
+        return None
+
     def detect_channels(self):
         return []
 
@@ -79,11 +117,28 @@ class FanController(ContextManager):
     def get_channel_speed(self, channel: str) -> int:
         pass
 
+    def get_channel_speeds(self, channels: Optional[List[str]] = None) -> SpeedSnapshot:
+        # read the speeds of the given (or all) channels within one device session
+        speeds: Dict[str, int] = {}
+        channels = list(self.channels) if channels is None else [channel for channel in channels if channel in self.channels]
+        if self.is_valid and channels:
+            LogManager.logger.trace(f"Getting fan speeds {repr({'controller': self.device_name, 'channels': channels})}")
+            try:
+                speeds = self._read_channel_speeds(channels)
+            except DeviceUnavailableError:
+                LogManager.logger.trace(f"Skipping unavailable fan controller {repr({'controller': self.device_name})}")
+            except BaseException:
+                LogManager.logger.exception(f"Error in getting fan speeds {repr({'controller': self.device_name})}")
+        return SpeedSnapshot(time.monotonic(), MappingProxyType(speeds))
+
+    def _read_channel_speeds(self, channels: List[str]) -> Dict[str, int]:
+        return {}
+
     def set_channel_speed(self, channel: str, new_pwm: int, current_percent: int, new_percent: int, temperature: float) -> bool:
         if self.is_valid:
-            LogManager.logger.info(f"Setting fan speed {repr({'controller': self.device.description, 'channel': channel, 'pwm': new_pwm, 'duty': new_percent, 'temperature': round(temperature, 1)})}")
-            if self._set_channel_speed_smoothly(channel, current_percent, new_percent):
-                return True
+            LogManager.logger.info(f"Setting fan speed {repr({'controller': self.device_name, 'channel': channel, 'pwm': new_pwm, 'duty': new_percent, 'temperature': round(temperature, 1)})}")
+            self._ramp_scheduler.set_target(channel, current_percent, new_percent)
+            return True
         return False
 
     def stop_all_channels(self) -> bool:
@@ -91,45 +146,29 @@ class FanController(ContextManager):
         for channel, fan in self.channels.items():
             result = result and self.stop_channel(channel, fan.get_current_pwm_as_percentage())
             fan.pwm = 0
-        return result
+        # wait for the fans to ramp down before returning
+        return self._ramp_scheduler.wait_idle(self.STOP_TIMEOUT) and result
 
     def stop_channel(self, channel: str, current_percent: int) -> bool:
         if self.is_valid:
-            LogManager.logger.info(f"Stopping fan {repr({'controller': self.device.description, 'channel': channel})}")
-            if self._set_channel_speed_smoothly(channel, current_percent, 0):
-                return True
-        return False
-
-    def _set_channel_speed_smoothly(self, channel: str, current_percent: int, new_percent: int) -> bool:
-        try:
-            if new_percent >= current_percent:
-                factor = 1
-            else:
-                factor = -1
-            steps = int(((new_percent - current_percent) * factor) / self.RPM_STEP) + 1
-            for i in range(1, steps):
-                duty = int(current_percent + i * factor * self.RPM_STEP)
-                LogManager.logger.trace(f"Adjusting fan speed {repr({'controller': self.device.description, 'channel': channel, 'duty': duty})}")
-                self._safe_call_controller_function(lambda: self.device.set_fixed_speed(channel=channel, duty=duty))
-                time.sleep(self.RPM_INTERVAL)
-            LogManager.logger.trace(f"Adjusting fan speed {repr({'controller': self.device.description, 'channel': channel, 'duty': new_percent})}")
-            self._safe_call_controller_function(lambda: self.device.set_fixed_speed(channel=channel, duty=new_percent))
+            LogManager.logger.info(f"Stopping fan {repr({'controller': self.device_name, 'channel': channel})}")
+            self._ramp_scheduler.set_target(channel, current_percent, 0)
             return True
-        except BaseException:
-            LogManager.logger.exception(f"Error in setting fan speed {repr({'controller': self.device.description, 'channel': channel})}")
         return False
 
-    def _safe_call_controller_function(self, function):
-        self._lock.acquire()
-        try:
-            self.device.connect()
-            result = function()
-        except Exception:
-            raise
-        finally:
-            self.device.disconnect()
-            self._lock.release()
-        return result
+    def _on_ramp_failed(self, channel: str, duty: int) -> None:
+        # the next tick sees a different pwm than the target and retries the change
+        fan: PWMFan = self.channels.get(channel)
+        if fan:
+            fan.set_current_pwm(FanCurve.percentage_to_pwm(duty))
+
+    def _write_channel_duty(self, channel: str, duty: int) -> None:
+        # ramping a fan to full speed goes ahead of all other device calls
+        priority = PRIORITY_EMERGENCY if self._ramp_scheduler.get_target(channel) == MAXPERCENTAGE else PRIORITY_SETPOINT
+        self._safe_call_controller_function(lambda: self.device.set_fixed_speed(channel=channel, duty=duty), priority)
+
+    def _safe_call_controller_function(self, function, priority: int = PRIORITY_STATUS, key: Optional[str] = None):
+        return self._session.call(function, priority, key)
 
 
 class ControllerManager(object):
@@ -139,9 +178,14 @@ class ControllerManager(object):
     def identify_fan_controllers():
         devices = find_liquidctl_devices()
         index = 0
+        hwmon_controllers = ControllerManager.identify_hwmon_controllers(Config.hwmon_root) if Config.commander_backend == 'hwmon' else []
         for dev in devices:
             controller: FanController = FanController()
-            if type(dev) == liquidctl.driver.commander_pro.CommanderPro:
+            if type(dev) == liquidctl.driver.commander_pro.CommanderPro and hwmon_controllers:
+                # the kernel driver takes the place of the device, so the controllers in saved profiles still match
+                controller = hwmon_controllers.pop(0)
+                LogManager.logger.info(f"Fan controller found {repr({'index': index, 'controller': controller.get_name(), 'chip': controller.chip_name})}")
+            elif type(dev) == liquidctl.driver.commander_pro.CommanderPro:
                 LogManager.logger.info(f"Fan controller found {repr({'index': index, 'controller': dev.description})}")
                 controller = CommanderProController(dev)
             elif type(dev) == liquidctl.driver.hydro_platinum.HydroPlatinum:
@@ -150,10 +194,29 @@ class ControllerManager(object):
             if controller.is_initialized():
                 ControllerManager.fan_controller.append(controller)
                 index += 1
+        for controller in hwmon_controllers:
+            # not accessible through liquidctl
+            LogManager.logger.info(f"Fan controller found {repr({'index': index, 'controller': controller.get_name(), 'chip': controller.chip_name})}")
+            ControllerManager.fan_controller.append(controller)
+            index += 1
+
+    @staticmethod
+    def identify_hwmon_controllers(hwmon_root: str = HWMON_ROOT) -> List['CommanderProHwmonController']:
+        controllers: List[CommanderProHwmonController] = list()
+        for chip in HwmonDiscovery.list_chips(hwmon_root):
+            if chip.prefix == CommanderProHwmonController.CHIP_PREFIX:
+                controller = CommanderProHwmonController(chip)
+                if controller.is_initialized():
+                    controllers.append(controller)
+        if not controllers:
+            LogManager.logger.warning(f"No Commander Pro found in hwmon - falling back to liquidctl {repr({'hwmon root': hwmon_root})}")
+        return controllers
 
 
 class CommanderProController(FanController, ContextManager):
 
+    profile_aliases = ("CommanderProHwmonController",)
+
     def __init__(self, device: liquidctl.driver.commander_pro.CommanderPro):
         self.device: liquidctl.driver.commander_pro.CommanderPro = device
         super().__init__()
@@ -175,12 +238,19 @@ class CommanderProController(FanController, ContextManager):
             fan_index = int(channel[-1]) - 1
             LogManager.logger.trace(f"Getting fan speed {repr({'controller': self.device.description, 'channel': channel, 'index': fan_index})}")
             try:
-                rpm = self._safe_call_controller_function(lambda: self.device._get_fan_rpm(fan_num=fan_index))
+                rpm = self._safe_call_controller_function(lambda: self.device._get_fan_rpm(fan_num=fan_index), key=f"speed-{channel}")
                 return rpm
+            except DeviceUnavailableError:
+                LogManager.logger.trace(f"Skipping unavailable fan controller {repr({'controller': self.device_name})}")
             except Exception as err:
                 LogManager.logger.exception(f"Error in getting fan speed {repr({'controller': self.device.description, 'channel': channel})}")
         return 0
 
+    def _read_channel_speeds(self, channels: List[str]) -> Dict[str, int]:
+        # the Commander Pro reports the rpm of one fan per command, so only the requested channels are read
+        return self._safe_call_controller_function(lambda: {channel: self.device._get_fan_rpm(fan_num=int(channel[-1]) - 1) for channel in channels},
+                                                   key=f"speeds-{'-'.join(channels)}")
+
 
 class HydroPlatinumController(FanController, ContextManager):
 
@@ -200,10 +270,113 @@ class HydroPlatinumController(FanController, ContextManager):
         if self.is_valid:
             LogManager.logger.trace(f"Getting fan speed {repr({'controller': self.device.description, 'channel': channel})}")
             try:
-                res = self._safe_call_controller_function(lambda: self.device._send_command(0b00, 0xff))
-                offset = self.channel_offsets[channel] + 1
-                rpm = int.from_bytes(res[offset:offset+2], byteorder='little')
-                return rpm
+                return self._get_speed_from_status(self._read_status(), channel)
+            except DeviceUnavailableError:
+                LogManager.logger.trace(f"Skipping unavailable fan controller {repr({'controller': self.device_name})}")
             except BaseException:
                 LogManager.logger.exception(f"Error in getting fan speed {repr({'controller': self.device.description, 'channel': channel})}")
         return 0
+
+    def _read_channel_speeds(self, channels: List[str]) -> Dict[str, int]:
+        # one status report contains the rpm of all fans
+        res = self._read_status()
+        return {channel: self._get_speed_from_status(res, channel) for channel in channels}
+
+    def _read_status(self):
+        # the status report is shared with the temperature sensor of the AIO
+        return self._session.call_cached("status", lambda: self.device._send_command(0b00, 0xff), Config.device_status_ttl)
+
+    def _get_speed_from_status(self, res, channel: str) -> int:
+        offset = self.channel_offsets[channel] + 1
+        return int.from_bytes(res[offset:offset+2], byteorder='little')
+
+
+class CommanderProHwmonController(FanController, ContextManager):
+    # Details: https://www.kernel.org/doc/html/latest/hwmon/corsair-cpro.html
+
+    CHIP_PREFIX: str = "corsaircpro"
+    profile_aliases = ("CommanderProController",)
+
+    def __init__(self, chip: HwmonChip):
+        self.device = None
+        self.device_name = "Corsair Commander Pro"
+        self.chip_name = chip.chip_name
+        self.chip_path = chip.attribute_path
+        self._speed_files: Dict[str, SysfsFile] = dict()
+        self._pwm_files: Dict[str, SysfsFile] = dict()
+        self._breaker = CircuitBreaker(self.device_name)
+        super().__init__()
+        try:
+            self.detect_channels()
+            self.is_valid = True
+            LogManager.logger.info(f"Fan controller initialized {repr({'controller': self.device_name, 'chip': self.chip_name})}")
+        except OSError:
+            self.is_valid = False
+            LogManager.logger.exception(f"Error in initializing fan controller {repr({'controller': self.device_name, 'chip': self.chip_name})}")
+
+    def __enter__(self):
+        if self.is_valid:
+            return self
+        return None
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self._ramp_scheduler.stop()
+        if self.is_valid:
+            for sysfs_file in [*self._speed_files.values(), *self._pwm_files.values()]:
+                sysfs_file.close()
+            self.is_valid = False
+            LogManager.logger.debug(f"Fan controller closed {repr({'controller': self.device_name, 'chip': self.chip_name})}")
+
+    def is_available(self) -> bool:
+        return self._breaker.is_available()
+
+    def get_breaker(self) -> Optional[CircuitBreaker]:
+        return self._breaker
+
+    def detect_channels(self):
+        # the driver hides the inputs of unconnected fans and labels the connected ones with their type
+        for file_name in sorted(os.listdir(self.chip_path)):
+            match = re.fullmatch(r"fan(\d+)_input", file_name)
+            if not match:
+                continue
+            channel = f"fan{match.group(1)}"
+            pwm_file = os.path.join(self.chip_path, f"pwm{match.group(1)}")
+            label = HwmonChip._read_attribute(os.path.join(self.chip_path, f"{channel}_label"))
+            if not os.path.isfile(pwm_file) or (label is not None and "4pin" not in label):
+                continue
+            self._speed_files[channel] = SysfsFile(os.path.join(self.chip_path, file_name))
+            self._pwm_files[channel] = SysfsFile(pwm_file)
+            self.channels[channel] = PWMFan(channel, FanCurve.zero_rpm_curve(), DummySensor())
+        self.channels = dict(sorted(self.channels.items(), key=lambda item: int(item[0][3:])))
+        LogManager.logger.debug(f"Detected fan channels {repr({'controller': self.device_name, 'channels': list(self.channels.keys())})}")
+
+    def get_channel_speed(self, channel: str) -> int:
+        if self.is_valid and channel in self._speed_files:
+            LogManager.logger.trace(f"Getting fan speed {repr({'controller': self.device_name, 'channel': channel})}")
+            try:
+                return self._safe_call_controller_function(lambda: self._speed_files[channel].read_int())
+            except DeviceUnavailableError:
+                LogManager.logger.trace(f"Skipping unavailable fan controller {repr({'controller': self.device_name})}")
+            except (OSError, ValueError):
+                LogManager.logger.exception(f"Error in getting fan speed {repr({'controller': self.device_name, 'channel': channel})}")
+        return 0
+
+    def _read_channel_speeds(self, channels: List[str]) -> Dict[str, int]:
+        return self._safe_call_controller_function(lambda: {channel: self._speed_files[channel].read_int() for channel in channels})
+
+    def _write_channel_duty(self, channel: str, duty: int) -> None:
+        # the driver takes the duty cycle as pwm value from 0 to 255
+        pwm = round(max(0, min(duty, MAXPERCENTAGE)) * 255 / MAXPERCENTAGE)
+        self._safe_call_controller_function(lambda: self._pwm_files[channel].write_int(pwm))
+
+    def _safe_call_controller_function(self, function, priority: int = PRIORITY_STATUS, key: Optional[str] = None):
+        # sysfs access is cheap enough to run on the calling thread
+        if not self._breaker.allow():
+            raise DeviceUnavailableError(self.device_name)
+        try:
+            result = function()
+        except BaseException:
+            self._breaker.record_failure()
+            raise
+        self._breaker.record_success()
+        return result
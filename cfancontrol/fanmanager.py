@@ -1,22 +1,51 @@
+import logging
 import os
 import signal
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError
 from contextlib import ExitStack
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Set, Tuple, NamedTuple
 
 from .log import LogManager
 from .settings import Environment, Config
-from .fancontroller import ControllerManager, FanController, CommanderProController
-from .fancurve import FanCurve, FanMode
+from .fancontroller import ControllerManager, FanController, CommanderProController, CommanderProHwmonController
+from .fancurve import FanCurve, FanMode, MAXTEMP, MAXPWM, MAXPERCENTAGE
 from .pwmfan import PWMFan
-from .sensor import Sensor
+from .sensor import Sensor, SensorReadCache, VirtualSensor
+from .hwsensor import HwSensor
+from .watcher import SensorWatcher
+from .sampler import SensorSampler
 from .sensormanager import SensorManager
 from .devicesensor import AIODeviceSensor
+from .devicesession import DeviceRegistry
+from .breaker import CircuitBreaker
 from .profilemanager import ProfileManager
 
 
+class ChannelInput(NamedTuple):
+    controller: FanController
+    channel: str
+    fan: PWMFan
+    current_pwm: int
+    temperature: float
+    is_stale: bool = False
+
+
+class ChannelUpdate(NamedTuple):
+    controller: FanController
+    channel: str
+    fan: PWMFan
+    new_pwm: int
+    new_percent: int
+    temperature: float
+
+
 class FanManager:
 
+    # channels due within this time of a tick are served by it
+    DUE_JITTER: float = 0.01
+
     _is_running: bool
     _active_controller: Optional[FanController]
     _fan_controller: Dict[int, FanController]
@@ -27,6 +56,15 @@ class FanManager:
         self._interval = Config.interval
         self._signals = Signals()
         self._callback = None
+        self._sensor_cache = SensorReadCache()
+        self._tick_statistics = TickStatistics()
+        self._adaptive_interval = AdaptiveInterval(self._interval)
+        self._watcher = SensorWatcher(self._signals.wakeup)
+        self._sampler: Optional[SensorSampler] = None
+        Sensor.latency_budget = Config.sensor_latency_budget
+        CircuitBreaker.configure(Config.breaker_threshold, Config.breaker_delay, Config.breaker_max_delay)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending_reads: Dict[int, Future] = {}
         self.manager_thread: Optional[threading.Thread] = None
 
         # register system signals to react to
@@ -61,13 +99,36 @@ class FanManager:
         except Exception:
             self._stack.close()
             raise
+        if Config.background_sampling:
+            self._start_sampler()
         return self
 
     def __exit__(self, exc_type, exc_value, exc_tb):
+        self._stop_sampler()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
         if self._stack is not None:
             self._stack.close()
+        SensorManager.close_system_sensors()
         return None
 
+    def _start_sampler(self):
+        # sensors are polled in the background and the control loop reads the buffered samples
+        self._sampler = SensorSampler(Config.sample_buffer_size, Config.sample_smoothing)
+        self._sampler.add_sensors(self._sensors)
+        self._sampler.start()
+        PWMFan.sampler = self._sampler
+
+    def _stop_sampler(self):
+        if self._sampler is not None:
+            PWMFan.sampler = None
+            self._sampler.stop()
+            self._sampler = None
+
+    def get_sampler(self) -> Optional[SensorSampler]:
+        return self._sampler
+
     def get_active_controller(self) -> Optional[FanController]:
         return self._active_controller
 
@@ -97,17 +158,41 @@ class FanManager:
         self._callback = callback
 
     def run(self) -> bool:
-        self.tick()
         aborted: bool = False
-        while not self._signals.wait_for_term_queued(self._interval):
+        self._tick_statistics.reset()
+        self._sensor_cache.reset_statistics()
+        self._adaptive_interval.reset(self._interval)
+        if Config.watch_sensors:
+            self._watcher.start(Config.watch_interval, Config.min_interval)
+        # ticks are scheduled against absolute deadlines so that the period does not drift
+        deadline = time.monotonic()
+        tick_time = deadline
+        statistics_time = deadline + Config.statistics_interval
+        while True:
             try:
-                self.tick()
+                self._scheduled_tick(tick_time)
             except Exception:
                 LogManager.logger.exception(f"Unhandled exception in fan manager")
                 LogManager.logger.critical("Aborting fan manager")
                 self._is_running = False
                 aborted = True
                 break
+            if 0.0 < Config.statistics_interval and statistics_time <= time.monotonic():
+                self._log_statistics(logging.DEBUG)
+                statistics_time = time.monotonic() + Config.statistics_interval
+            if tick_time == deadline:
+                deadline = self._next_deadline(deadline)
+            if self._signals.wait_for_term_queued(max(0.0, deadline - time.monotonic())):
+                break
+            tick_time = deadline
+            now = time.monotonic()
+            if now < deadline:
+                # woken up early by the sensor watcher, the regular ticks stay on their grid
+                self._tick_statistics.add_wakeup()
+                self._mark_channels_due(self._watcher.pop_crossed_sensors())
+                tick_time = now
+        self._watcher.stop()
+        self._log_statistics(logging.INFO)
 
         try:
             for controller in self._fan_controller.values():
@@ -122,6 +207,72 @@ class FanManager:
 
         return aborted
 
+    def _log_statistics(self, level: int) -> None:
+        # where the tick time goes and how the devices and sensors behave
+        hits, misses = self.get_sensor_cache_statistics()
+        LogManager.logger.log(level, f"Fan manager tick statistics {repr(self.get_tick_statistics())}")
+        LogManager.logger.log(level, f"Sensor cache statistics {repr({'hits': hits, 'misses': misses})}")
+        LogManager.logger.log(level, f"Sensor latency statistics {repr(self.get_sensor_latency_statistics())}")
+        LogManager.logger.log(level, f"Device statistics {repr(self.get_device_statistics())}")
+        LogManager.logger.log(level, f"Reconnect counts {repr(self.get_reconnect_counts())}")
+        LogManager.logger.log(level, f"Device and sensor health {repr(self.get_breaker_statistics())}")
+
+    def _scheduled_tick(self, deadline: float) -> None:
+        interval = self.get_loop_interval()
+        start = time.monotonic()
+        evaluated = self.tick(due_only=True)
+        duration = time.monotonic() - start
+        self._tick_statistics.add_tick(start - deadline, duration, interval)
+        if duration > interval:
+            LogManager.logger.debug(f"Fan manager tick overran interval {repr({'duration': round(duration, 3), 'interval': interval})}")
+        fans = [fan for controller in self._fan_controller.values() for fan in controller.channels.values()]
+        # only channels that were read in this tick carry new temperatures for the slope
+        adaptive_fans = [fan for fan in evaluated if not fan.interval]
+        if Config.adaptive_interval and adaptive_fans:
+            last_interval = self._adaptive_interval.get_interval()
+            if self._adaptive_interval.update(adaptive_fans, time.monotonic()) < last_interval:
+                self._pull_in_channels(start)
+        if Config.watch_sensors:
+            self._watcher.set_thresholds(self._get_watch_thresholds(fans))
+
+    def _pull_in_channels(self, last_update: float) -> None:
+        # channels scheduled with the longer interval follow a shorter one right away
+        next_update = last_update + self.get_effective_interval()
+        for controller in self._fan_controller.values():
+            for fan in controller.channels.values():
+                if not fan.interval:
+                    fan.next_update = min(fan.next_update, next_update)
+
+    def _mark_channels_due(self, sensors: Set[Sensor]) -> None:
+        # channels bound to a sensor that crossed a threshold are updated right away
+        for controller in self._fan_controller.values():
+            for fan in controller.channels.values():
+                if fan.needs_temperature() and sensors.intersection(self._get_input_sensors(fan.temp_sensor)):
+                    fan.mark_due()
+
+    @staticmethod
+    def _get_watch_thresholds(fans: List[PWMFan]) -> Dict[Sensor, List[float]]:
+        # only cheap sysfs sensors are watched in between ticks
+        thresholds: Dict[Sensor, List[float]] = dict()
+        for fan in fans:
+            if fan.needs_temperature() and isinstance(fan.temp_sensor, HwSensor):
+                values = thresholds.setdefault(fan.temp_sensor, list(Config.watch_thresholds))
+                for temp_range in fan.fan_curve.get_ranges():
+                    values.append(temp_range.low_temp)
+                    values.append(temp_range.high_temp)
+        return thresholds
+
+    def _next_deadline(self, deadline: float) -> float:
+        interval = self.get_loop_interval()
+        deadline += interval
+        now = time.monotonic()
+        if deadline < now and Config.missed_tick_policy == 'skip':
+            missed = int((now - deadline) / interval) + 1
+            deadline += missed * interval
+            self._tick_statistics.add_missed_ticks(missed)
+            LogManager.logger.debug(f"Skipping missed fan manager ticks {repr({'missed': missed})}")
+        return deadline
+
     def toggle_manager(self, mode: bool):
         if mode:
             self.start()
@@ -148,22 +299,206 @@ class FanManager:
         else:
             return False
 
-    def tick(self) -> None:
+    def tick(self, due_only: bool = False) -> List[PWMFan]:
+        # returns the fans evaluated in this tick
         if self.is_manager_running():
-            for controller in self._fan_controller.values():
-                for channel, fan in controller.channels.items():
-                    update, new_pwm, new_percent, temperature = fan.update_pwm(controller.get_channel_speed(channel))
-                    if update:
-                        if controller.set_channel_speed(channel, new_pwm, fan.get_current_pwm_as_percentage(), new_percent, temperature):
-                            fan.set_current_pwm(new_pwm)
+            # every sensor is read at most once per tick
+            self._sensor_cache.clear()
+            SensorManager.begin_tick()
+            start = time.monotonic()
+            inputs = self._gather_inputs(start, due_only)
+            gathered = time.monotonic()
+            updates = self._compute_updates(inputs)
+            computed = time.monotonic()
+            self._dispatch_updates(updates)
+            self._tick_statistics.add_phases(gathered - start, computed - gathered, time.monotonic() - computed)
+            return [channel_input.fan for channel_input in inputs]
+        return []
+
+    def _get_due_channels(self, controller: FanController, now: float, due_only: bool) -> Dict[str, PWMFan]:
+        # channels with their own update period are only touched when they are due
+        interval = self.get_effective_interval()
+        due_channels: Dict[str, PWMFan] = dict()
+        for channel, fan in controller.channels.items():
+            is_due = fan.is_due(now + self.DUE_JITTER)
+            if is_due:
+                fan.schedule_next_update(now, interval)
+            if is_due or not due_only:
+                due_channels[channel] = fan
+        return due_channels
+
+    def _gather_inputs(self, now: float, due_only: bool) -> List[ChannelInput]:
+        # phase 1: read the fan speeds and sensor temperatures of all due channels
+        due_controllers: Dict[int, Dict[str, PWMFan]] = dict()
+        for index, controller in self._fan_controller.items():
+            if not controller.is_available():
+                # a failing device is left alone until its next probe is due
+                continue
+            due_channels = self._get_due_channels(controller, now, due_only)
+            if due_channels:
+                due_controllers[index] = due_channels
+        # sample all due hwmon sensors in one batch
+        input_sensors = {sensor for due_channels in due_controllers.values() for fan in due_channels.values() if fan.needs_temperature()
+                         for sensor in self._get_input_sensors(fan.temp_sensor)}
+        hw_sensors = [sensor for sensor in input_sensors if isinstance(sensor, HwSensor) and not self._is_sampled(sensor)]
+        if hw_sensors:
+            self._sensor_cache.add_readings(HwSensor.read_all(hw_sensors))
+        if Config.parallel_controllers and len(due_controllers) > 1:
+            inputs = self._gather_inputs_parallel(due_controllers)
+        else:
+            inputs: List[ChannelInput] = []
+            for index, due_channels in due_controllers.items():
+                inputs.extend(self._gather_controller_inputs(self._fan_controller[index], due_channels))
+        if Config.demotion_reads > 0:
+            self._demote_slow_sensors(input_sensors)
+        return inputs
+
+    def _demote_slow_sensors(self, sensors: Set[Sensor]) -> None:
+        # sensors that keep blowing their latency budget are moved to background polling
+        for sensor in sensors:
+            if sensor.latency.slow_streak < Config.demotion_reads or (self._sampler is not None and self._sampler.has_sensor(sensor)):
+                continue
+            LogManager.logger.warning(f"Moving slow sensor to background polling {repr({'sensor': sensor.get_name(), 'latency': sensor.latency.get_statistics()})}")
+            if self._sampler is None:
+                self._sampler = SensorSampler(Config.sample_buffer_size, Config.sample_smoothing)
+                PWMFan.sampler = self._sampler
+            self._sampler.add_sensor(sensor)
+            self._sampler.start()
+
+    @staticmethod
+    def _get_input_sensors(sensor: Sensor) -> List[Sensor]:
+        if isinstance(sensor, VirtualSensor):
+            return sensor.get_leaf_sensors()
+        return [sensor]
+
+    def _is_sampled(self, sensor: Sensor) -> bool:
+        return self._sampler is not None and self._sampler.get_latest(sensor) is not None
+
+    def _gather_controller_inputs(self, controller: FanController, channels: Dict[str, PWMFan]) -> List[ChannelInput]:
+        speeds = controller.get_channel_speeds(list(channels))
+        inputs: List[ChannelInput] = []
+        for channel, fan in channels.items():
+            temperature = 0.0
+            is_stale = False
+            if fan.needs_temperature():
+                temperature = fan.get_current_temp(self._sensor_cache)
+                if fan.temp_sensor.is_stale(Config.stale_timeout):
+                    # no new value for too long, so run the fan at full speed
+                    LogManager.logger.warning(f"Sensor data is stale {repr({'sensor': fan.temp_sensor.get_name(), 'age': round(fan.temp_sensor.get_age(), 1), 'last temp': temperature})}")
+                    is_stale = True
+            inputs.append(ChannelInput(controller, channel, fan, speeds.get_speed(channel), temperature, is_stale))
+        return inputs
+
+    def _gather_inputs_parallel(self, due_controllers: Dict[int, Dict[str, PWMFan]]) -> List[ChannelInput]:
+        # read the inputs of each controller on its own worker and join them before the compute phase
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=len(self._fan_controller), thread_name_prefix="cfancontrol-tick")
+        deadline = time.monotonic() + Config.controller_deadline
+        reads: Dict[int, Future] = {}
+        for index, due_channels in due_controllers.items():
+            controller = self._fan_controller[index]
+            pending = self._pending_reads.get(index)
+            if pending is not None:
+                if not pending.done():
+                    LogManager.logger.warning(f"Skipping fan controller - previous update still running {repr({'controller': controller.get_name()})}")
+                    continue
+                del self._pending_reads[index]
+            reads[index] = self._executor.submit(self._gather_controller_inputs, controller, due_channels)
+        inputs: List[ChannelInput] = []
+        for index, read in reads.items():
+            try:
+                inputs.extend(read.result(timeout=max(0.0, deadline - time.monotonic())))
+            except TimeoutError:
+                LogManager.logger.warning(f"Fan controller update exceeded deadline {repr({'controller': self._fan_controller[index].get_name(), 'deadline': Config.controller_deadline})}")
+                self._pending_reads[index] = read
+        return inputs
+
+    @staticmethod
+    def _compute_updates(inputs: List[ChannelInput]) -> List[ChannelUpdate]:
+        # phase 2: evaluate the fan curves of all channels
+        updates: List[ChannelUpdate] = []
+        for channel_input in inputs:
+            if channel_input.is_stale:
+                # the fail-safe bypasses the fan curve
+                new_pwm = MAXPWM
+                if channel_input.fan.get_current_pwm() != new_pwm:
+                    updates.append(ChannelUpdate(channel_input.controller, channel_input.channel, channel_input.fan, new_pwm, MAXPERCENTAGE, channel_input.temperature))
+                continue
+            update, new_pwm, new_percent, temperature = channel_input.fan.evaluate_pwm(channel_input.current_pwm, channel_input.temperature)
+            if update:
+                updates.append(ChannelUpdate(channel_input.controller, channel_input.channel, channel_input.fan, new_pwm, new_percent, temperature))
+        return updates
+
+    @staticmethod
+    def _dispatch_updates(updates: List[ChannelUpdate]) -> None:
+        # phase 3: hand the new duties to the ramp schedulers of the controllers
+        for update in updates:
+            # set before the ramp starts, so a failed ramp can reset it to the duty actually written
+            current_pwm = update.fan.get_current_pwm()
+            update.fan.set_current_pwm(update.new_pwm)
+            if not update.controller.set_channel_speed(update.channel, update.new_pwm, FanCurve.pwm_to_percentage(current_pwm), update.new_percent, update.temperature):
+                update.fan.set_current_pwm(current_pwm)
 
     def update_interval(self, interval: float):
         self._interval = interval
+        self._adaptive_interval.reset(interval)
+
+    def get_interval(self) -> float:
+        return self._interval
+
+    def get_effective_interval(self) -> float:
+        if Config.adaptive_interval:
+            return self._adaptive_interval.get_interval()
+        return self._interval
+
+    def get_loop_interval(self) -> float:
+        # the manager wakes up often enough to serve the channel with the shortest update period
+        interval = self.get_effective_interval()
+        for controller in self._fan_controller.values():
+            for fan in controller.channels.values():
+                if fan.interval:
+                    interval = min(interval, fan.interval)
+        return interval
+
+    def get_tick_statistics(self) -> Dict[str, float]:
+        return self._tick_statistics.get_statistics()
+
+    def get_sensor_latency_statistics(self) -> Dict[str, Dict[str, float]]:
+        return {sensor.get_name(): sensor.latency.get_statistics() for sensor in self._sensors if sensor.latency.read_count}
+
+    def get_sensor_cache_statistics(self) -> Tuple[int, int]:
+        return self._sensor_cache.get_statistics()
+
+    @staticmethod
+    def get_device_statistics() -> Dict[str, Dict[str, float]]:
+        # queue depth and wait times of the device I/O workers
+        return DeviceRegistry.get_statistics()
+
+    def get_breaker_statistics(self) -> Dict[str, Dict[str, float]]:
+        # health of all devices and of the sensors that failed at least once
+        statistics = {session.device_name: session.breaker.get_statistics() for session in DeviceRegistry.sessions.values()}
+        for controller in self._fan_controller.values():
+            # controllers without a device session own their breaker
+            breaker = controller.get_breaker()
+            if breaker is not None:
+                statistics[controller.get_name()] = breaker.get_statistics()
+        for sensor in self._sensors:
+            breaker = sensor.get_breaker()
+            if breaker is not None and (breaker.open_count or breaker.failure_count):
+                statistics[sensor.get_name()] = breaker.get_statistics()
+        return statistics
+
+    def get_reconnect_counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {c.get_name(): c.get_reconnect_count() for c in self._fan_controller.values()}
+        for sensor in self._sensors:
+            if isinstance(sensor, AIODeviceSensor):
+                counts[sensor.get_name()] = sensor.get_reconnect_count()
+        return counts
 
     def apply_fan_mode(self, channel: str, sensor: int, curve_data: FanCurve, profile=None):
         fan: PWMFan = self._active_controller.channels.get(channel)
         if fan:
-            fan.temp_sensor = self._sensors[sensor]
+            fan.temp_sensor = SensorManager.get_sensor(sensor) or self._sensors[0]
             fan.fan_curve = curve_data
             self.tick()
             if profile:
@@ -181,7 +516,7 @@ class FanManager:
     def get_channel_sensor(self, channel: str) -> int:
         fan: PWMFan = self._active_controller.channels.get(channel)
         if fan:
-            return self._sensors.index(fan.temp_sensor)
+            return SensorManager.get_sensor_id(fan.temp_sensor)
         return 0
 
     def get_channel_fancurve(self, channel: str) -> Optional[FanCurve]:
@@ -222,6 +557,8 @@ class FanManager:
             channel_dict: Dict[str, dict] = dict()
             for channel, fan in controller.channels.items():
                 channel_dict[channel] = {"curve": fan.fan_curve.get_graph_points_from_curve(), "sensor": fan.temp_sensor.get_signature()}
+                if fan.interval:
+                    channel_dict[channel]["interval"] = fan.interval
             controller_dict: Dict[str, any] = dict()
             controller_dict["id"] = index
             controller_dict["name"] = controller.get_name()
@@ -241,13 +578,13 @@ class FanManager:
                     if len(saved_controllers_list) > index:
                         saved_controller = saved_controllers_list[index]
                         if saved_controller:
-                            if saved_controller["class"] == controller.__class__.__name__:
+                            if saved_controller["class"] in (controller.__class__.__name__, *controller.profile_aliases):
                                 saved_channels = saved_controller.get("channels")
                                 self._deserialize_channel_config(saved_channels, controller.channels)
                                 continue
             else:
                 for index, controller in self._fan_controller.items():
-                    if type(controller) == CommanderProController:
+                    if type(controller) in (CommanderProController, CommanderProHwmonController):
                         self._deserialize_channel_config(profile_data, controller.channels)
 
     def _deserialize_channel_config(self, saved_channels, controller_channels):
@@ -256,10 +593,11 @@ class FanManager:
                 channel_config = saved_channels.get(channel)
                 if channel_config:
                     sensor_config = channel_config["sensor"]
-                    sensor = [s for s in self._sensors if s.get_signature() == sensor_config]
+                    sensor = SensorManager.get_profile_sensor(sensor_config)
                     if sensor:
-                        fan.temp_sensor = sensor[0]
+                        fan.temp_sensor = sensor
                         fan.fan_curve.set_curve_from_graph_points(channel_config["curve"])
+                        fan.set_interval(channel_config.get("interval"))
                         continue
 
 
@@ -267,15 +605,139 @@ class Signals:
 
     def __init__(self):
         self._term_event = threading.Event()
+        self._wake_event = threading.Event()
 
     def sigterm(self, signum, stackframe):
         self._term_event.set()
+        self._wake_event.set()
+
+    def wakeup(self):
+        self._wake_event.set()
 
     def reset(self):
         self._term_event.clear()
+        self._wake_event.clear()
 
     def wait_for_term_queued(self, seconds: float) -> bool:
-        is_set = self._term_event.wait(seconds)
-        if is_set:
+        self._wake_event.wait(seconds)
+        self._wake_event.clear()
+        if self._term_event.is_set():
             return True
         return False
+
+
+class TickStatistics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.tick_count = 0
+            self.overrun_count = 0
+            self.missed_ticks = 0
+            self.wakeups = 0
+            self.last_lateness = 0.0
+            self.max_lateness = 0.0
+            self.last_duration = 0.0
+            self.last_overrun = 0.0
+            self.max_overrun = 0.0
+            self.gather_duration = 0.0
+            self.compute_duration = 0.0
+            self.dispatch_duration = 0.0
+
+    def add_tick(self, lateness: float, duration: float, interval: float):
+        overrun = max(0.0, duration - interval)
+        with self._lock:
+            self.tick_count += 1
+            self.last_lateness = max(0.0, lateness)
+            self.max_lateness = max(self.max_lateness, self.last_lateness)
+            self.last_duration = duration
+            self.last_overrun = overrun
+            self.max_overrun = max(self.max_overrun, overrun)
+            if overrun > 0.0:
+                self.overrun_count += 1
+
+    def add_phases(self, gather: float, compute: float, dispatch: float):
+        with self._lock:
+            self.gather_duration = gather
+            self.compute_duration = compute
+            self.dispatch_duration = dispatch
+
+    def add_wakeup(self):
+        with self._lock:
+            self.wakeups += 1
+
+    def add_missed_ticks(self, count: int):
+        with self._lock:
+            self.missed_ticks += count
+
+    def get_statistics(self) -> Dict[str, float]:
+        with self._lock:
+            return {'ticks': self.tick_count, 'overruns': self.overrun_count, 'missed': self.missed_ticks, 'wakeups': self.wakeups,
+                    'lateness': self.last_lateness, 'max lateness': self.max_lateness,
+                    'duration': self.last_duration, 'overrun': self.last_overrun, 'max overrun': self.max_overrun,
+                    'gather': self.gather_duration, 'compute': self.compute_duration, 'dispatch': self.dispatch_duration}
+
+
+class AdaptiveInterval:
+
+    BACKOFF_FACTOR: float = 1.25
+
+    def __init__(self, interval: float):
+        self._lock = threading.Lock()
+        self._last_temperatures: Dict[Sensor, Tuple[float, float]] = dict()
+        self.reset(interval)
+
+    def reset(self, interval: float):
+        with self._lock:
+            self._last_temperatures.clear()
+            self.interval = min(max(interval, Config.min_interval), Config.max_interval)
+            self.slope = 0.0
+            self.distance = float(MAXTEMP)
+
+    def get_interval(self) -> float:
+        return self.interval
+
+    def update(self, fans: List[PWMFan], now: float) -> float:
+        max_slope = 0.0
+        min_distance = float(MAXTEMP)
+        min_time = float('inf')
+        has_slope = False
+        temperatures: Dict[Sensor, float] = dict()
+        slopes: Dict[Sensor, float] = dict()
+        with self._lock:
+            for fan in fans:
+                if fan.fan_curve.get_fan_mode() != FanMode.Curve:
+                    continue
+                temperature = fan.temperature
+                if fan.temp_sensor not in temperatures:
+                    temperatures[fan.temp_sensor] = temperature
+                    slopes[fan.temp_sensor] = 0.0
+                    last = self._last_temperatures.get(fan.temp_sensor)
+                    if last is not None and now > last[1]:
+                        has_slope = True
+                        slopes[fan.temp_sensor] = (temperature - last[0]) / (now - last[1])
+                        max_slope = max(max_slope, abs(slopes[fan.temp_sensor]))
+                slope = slopes[fan.temp_sensor]
+                for temp_range in fan.fan_curve.get_ranges():
+                    for threshold in (temp_range.low_temp, temp_range.high_temp):
+                        # signed distance: only breakpoints the temperature of this sensor is moving toward count
+                        distance = threshold - temperature
+                        if slope * distance > 0:
+                            min_distance = min(min_distance, abs(distance))
+                            min_time = min(min_time, distance / slope)
+            # sensors of channels that were not evaluated keep their last reading
+            self._last_temperatures.update({sensor: (temperature, now) for sensor, temperature in temperatures.items()})
+            self.slope = max_slope
+            self.distance = min_distance
+            # sample faster if temperatures change quickly or a curve breakpoint would be crossed before the next tick
+            if not has_slope:
+                # first reading of the sensors, nothing to adapt to yet
+                return self.interval
+            if max_slope >= Config.adaptive_slope or min_time <= self.interval:
+                self.interval = max(Config.min_interval, self.interval / 2)
+            else:
+                self.interval = min(Config.max_interval, self.interval * self.BACKOFF_FACTOR)
+            return self.interval
@@ -191,9 +191,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self._set_controller_combobox()
         self.ui.comboBox_controller.currentIndexChanged.connect(lambda: self._select_fan_controller(self.ui.comboBox_controller.currentIndex()))
 
-        self.ui.comboBox_sensors.clear()
-        for sensor in SensorManager.system_sensors:
-            self.ui.comboBox_sensors.addItem(sensor.get_name())
+        self._set_sensors_combobox()
 
         self._active_button: Optional[QtWidgets.QPushButton] = None
         self._active_curve: Optional[FanCurve] = None
@@ -516,6 +514,12 @@ class MainWindow(QtWidgets.QMainWindow):
                 self.ui.graphicsView_fancurve.update_line('currTemp', round(fan_temperature, 1))
                 self.ui.graphicsView_fancurve.update_line('currFan', fan_percent)
 
+    def _set_sensors_combobox(self):
+        # loading a profile might add virtual sensors
+        self.ui.comboBox_sensors.clear()
+        for sensor in SensorManager.system_sensors:
+            self.ui.comboBox_sensors.addItem(sensor.get_name())
+
     def _set_profiles_combobox(self):
         self.ui.comboBox_profiles.clear()
         self.ui.comboBox_profiles.addItems(ProfileManager.profiles)
@@ -531,6 +535,8 @@ class MainWindow(QtWidgets.QMainWindow):
         self._toggle_manager(mode=False)
         window_title = Environment.APP_FANCY_NAME
         success, applied_profile = self.manager.set_profile(profile_name)
+        if self.ui.comboBox_sensors.count() != len(SensorManager.system_sensors):
+            self._set_sensors_combobox()
         if success:
             window_title += " - " + applied_profile
             if auto_start:
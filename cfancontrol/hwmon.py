@@ -0,0 +1,198 @@
+import os
+import re
+import shlex
+from fnmatch import fnmatchcase
+from typing import Dict, List, Optional, Tuple
+
+from .hwsensor import HwSensor
+from .log import LogManager
+
+HWMON_ROOT: str = "/sys/class/hwmon"
+
+
+class SensorsConfig(object):
+
+    def __init__(self) -> None:
+        self.chips: List[Tuple[List[str], Dict[str, str], List[str]]] = list()
+
+    @staticmethod
+    def from_file(file_name: str) -> 'SensorsConfig':
+        config = SensorsConfig()
+        if file_name and os.path.isfile(file_name):
+            try:
+                with open(file_name, 'r') as config_file:
+                    config.parse(config_file.read())
+            except OSError:
+                LogManager.logger.exception(f"Error reading sensors configuration {repr({'file': file_name})}")
+        return config
+
+    def parse(self, text: str) -> None:
+        # only 'chip', 'label' and 'ignore' statements of sensors3.conf are relevant here
+        labels: Optional[Dict[str, str]] = None
+        ignores: Optional[List[str]] = None
+        for line_number, line in self._join_lines(text):
+            try:
+                tokens = shlex.split(line, comments=True)
+            except ValueError as err:
+                LogManager.logger.warning(f"Skipping invalid statement in sensors configuration {repr({'line': line_number, 'error': str(err)})}")
+                continue
+            if not tokens:
+                continue
+            statement = tokens[0]
+            if statement == "chip" and len(tokens) > 1:
+                labels = dict()
+                ignores = list()
+                self.chips.append((tokens[1:], labels, ignores))
+            elif statement == "label" and len(tokens) > 2 and labels is not None:
+                labels[tokens[1]] = tokens[2]
+            elif statement == "ignore" and len(tokens) > 1 and ignores is not None:
+                ignores.append(tokens[1])
+
+    @staticmethod
+    def _join_lines(text: str) -> List[Tuple[int, str]]:
+        # statements continue on the next line after a trailing backslash (e.g. long chip statements)
+        statements: List[Tuple[int, str]] = list()
+        statement = ""
+        first_line = 0
+        for line_number, line in enumerate(text.splitlines(), 1):
+            if not statement:
+                first_line = line_number
+            stripped = line.rstrip()
+            if stripped.endswith("\\") and not stripped.lstrip().startswith("#"):
+                statement += stripped[:-1] + " "
+                continue
+            statements.append((first_line, statement + line))
+            statement = ""
+        if statement:
+            statements.append((first_line, statement))
+        return statements
+
+    def get_label(self, chip_name: str, feature: str) -> Optional[str]:
+        # later statements override earlier ones, as in libsensors
+        label = None
+        for patterns, labels, _ in self.chips:
+            if feature in labels and self._matches(chip_name, patterns):
+                label = labels[feature]
+        return label
+
+    def is_ignored(self, chip_name: str, feature: str) -> bool:
+        for patterns, _, ignores in self.chips:
+            if feature in ignores and self._matches(chip_name, patterns):
+                return True
+        return False
+
+    @staticmethod
+    def _matches(chip_name: str, patterns: List[str]) -> bool:
+        return any(fnmatchcase(chip_name, pattern) for pattern in patterns)
+
+
+class HwmonChip(object):
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.attribute_path = path
+        self.prefix = ""
+        self.chip_name = ""
+
+    @staticmethod
+    def from_path(path: str) -> Optional['HwmonChip']:
+        chip = HwmonChip(path)
+        # old drivers keep their attributes in the device folder (not resolved, as in libsensors, so signatures match)
+        if not os.path.isfile(os.path.join(path, "name")):
+            chip.attribute_path = os.path.join(path, "device")
+        prefix = HwmonChip._read_attribute(os.path.join(chip.attribute_path, "name"))
+        if not prefix:
+            return None
+        chip.prefix = prefix
+        chip.chip_name = f"{prefix}-{HwmonChip._get_bus_name(path)}"
+        return chip
+
+    def get_temp_features(self) -> List[str]:
+        features = list()
+        for file_name in os.listdir(self.attribute_path):
+            match = re.fullmatch(r"(temp\d+)_input", file_name)
+            if match:
+                features.append(match.group(1))
+        return sorted(features, key=lambda feature: int(feature[4:]))
+
+    def get_feature_label(self, feature: str) -> Optional[str]:
+        return self._read_attribute(os.path.join(self.attribute_path, feature + "_label"))
+
+    @staticmethod
+    def _get_bus_name(path: str) -> str:
+        # chip names follow the format of libsensors (e.g. k10temp-pci-00c3)
+        device_link = os.path.join(path, "device")
+        if not os.path.exists(device_link):
+            return "virtual-0"
+        device_name = os.path.basename(os.path.realpath(device_link))
+        subsystem = os.path.basename(os.path.realpath(os.path.join(device_link, "subsystem")))
+        if subsystem == "pci":
+            match = re.fullmatch(r"([0-9a-fA-F]+):([0-9a-fA-F]+):([0-9a-fA-F]+)\.([0-9a-fA-F]+)", device_name)
+            if match:
+                domain, bus, slot, function = (int(part, 16) for part in match.groups())
+                return f"pci-{(domain << 16) + (bus << 8) + (slot << 3) + function:04x}"
+        elif subsystem == "i2c":
+            match = re.fullmatch(r"(\d+)-([0-9a-fA-F]+)", device_name)
+            if match:
+                return f"i2c-{int(match.group(1))}-{int(match.group(2), 16):02x}"
+        elif subsystem == "spi":
+            match = re.fullmatch(r"spi(\d+)\.(\d+)", device_name)
+            if match:
+                return f"spi-{int(match.group(1))}-{int(match.group(2)):x}"
+        elif subsystem in ("platform", "of_platform"):
+            match = re.fullmatch(r"[a-z0-9_]+\.(\d+)", device_name)
+            return f"isa-{int(match.group(1)) if match else 0:04x}"
+        elif subsystem == "acpi":
+            return "acpi-0"
+        elif subsystem == "hid":
+            match = re.fullmatch(r"([0-9a-fA-F]+):([0-9a-fA-F]+):([0-9a-fA-F]+)\.([0-9a-fA-F]+)", device_name)
+            if match:
+                return f"hid-{int(match.group(1), 16)}-{int(match.group(4), 16):x}"
+        return "virtual-0"
+
+    @staticmethod
+    def _read_attribute(file_name: str) -> Optional[str]:
+        try:
+            with open(file_name, 'r') as file:
+                return file.read().strip()
+        except OSError:
+            return None
+
+
+class HwmonDiscovery(object):
+
+    @staticmethod
+    def list_chips(hwmon_root: str = HWMON_ROOT) -> List[HwmonChip]:
+        chips = list()
+        if not os.path.isdir(hwmon_root):
+            return chips
+        entries = [entry for entry in os.listdir(hwmon_root) if re.fullmatch(r"hwmon\d+", entry)]
+        for entry in sorted(entries, key=lambda name: int(name[5:])):
+            chip = HwmonChip.from_path(os.path.join(hwmon_root, entry))
+            if chip:
+                chips.append(chip)
+        return chips
+
+    @staticmethod
+    def find_chip(prefix: str, hwmon_root: str = HWMON_ROOT) -> Optional[HwmonChip]:
+        for chip in HwmonDiscovery.list_chips(hwmon_root):
+            if chip.prefix == prefix:
+                return chip
+        return None
+
+    @staticmethod
+    def discover_sensors(config_file: str, hwmon_root: str = HWMON_ROOT) -> List[HwSensor]:
+        config = SensorsConfig.from_file(config_file)
+        hw_sensors: List[HwSensor] = list()
+        for chip in HwmonDiscovery.list_chips(hwmon_root):
+            LogManager.logger.info(f"System sensor found {repr({'name': chip.prefix, 'chip': chip.chip_name})}")
+            for feature in chip.get_temp_features():
+                if config.is_ignored(chip.chip_name, feature):
+                    continue
+                label = config.get_label(chip.chip_name, feature) or chip.get_feature_label(feature) or feature
+                if label == feature:
+                    # no label set for feature, so add prefix
+                    label = chip.prefix + "_" + feature
+                LogManager.logger.debug(f"Adding feature {repr({'chip': chip.prefix, 'feature name': feature, 'label': label})}")
+                hw_sensors.append(HwSensor(chip.chip_name, chip.attribute_path, feature, label))
+        return hw_sensors
@@ -1,10 +1,77 @@
 import os
-from typing import Optional
+import threading
+import time
+from typing import Optional, Dict, List
 
 from .sensor import Sensor
 from .log import LogManager
 
 
+class SysfsFile(object):
+
+    READ_SIZE: int = 32
+
+    def __init__(self, file_name: str, read_size: int = READ_SIZE, follow_replace: bool = False) -> None:
+        self.file_name = file_name
+        self.read_size = read_size
+        self.follow_replace = follow_replace
+        self.reopen_count = 0
+        self._fd: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def read(self) -> bytes:
+        # keep the file open and read from offset 0 for every sample
+        with self._lock:
+            try:
+                return self._read()
+            except OSError:
+                # the device might have been re-created, so reopen the file once
+                if self._fd is None:
+                    raise
+                self._close()
+                self.reopen_count += 1
+                LogManager.logger.debug(f"Reopening sysfs file {repr({'file': self.file_name, 'reopens': self.reopen_count})}")
+                return self._read()
+
+    def read_int(self) -> int:
+        return int(self.read())
+
+    def read_float(self) -> float:
+        return float(self.read())
+
+    def write(self, data: bytes) -> None:
+        # like 'echo > file', so a shorter value does not leave a tail in a regular file
+        with self._lock:
+            fd = os.open(self.file_name, os.O_WRONLY | os.O_TRUNC | os.O_CLOEXEC)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+
+    def write_int(self, value: int) -> None:
+        self.write(str(value).encode('ascii'))
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+    def _read(self) -> bytes:
+        if self._fd is not None and self.follow_replace and os.stat(self.file_name).st_ino != os.fstat(self._fd).st_ino:
+            # regular files are often replaced by a rename instead of being rewritten
+            self._close()
+        if self._fd is None:
+            self._fd = os.open(self.file_name, os.O_RDONLY | os.O_CLOEXEC)
+        return os.pread(self._fd, self.read_size, 0)
+
+    def _close(self) -> None:
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = None
+
+
 class HwSensor(Sensor):
 
     def __init__(self, chip_name: str, sensor_path: str, feature: str, feature_label: str) -> None:
@@ -15,37 +82,99 @@ class HwSensor(Sensor):
         self.sensor_feature = feature
         self.sensor_file = os.path.join(self.sensor_folder, feature + "_input")
         self.current_temp = 0.0
+        self._file = SysfsFile(self.sensor_file)
 
     def get_temperature(self) -> float:
         temp, success = self.get_sensor_data()
         if success:
-            LogManager.logger.debug(f"Getting sensor temperature {repr({'sensor': self.sensor_name, 'temperature': temp})}")
-            if self.current_temp == 0.0 or (10.0 < temp < 99.0):
-                self.current_temp = temp
-            else:
-                LogManager.logger.warning(f"Sensor temperature data out of range {repr({'sensor': self.sensor_name, 'last temp': self.current_temp, 'new temp': temp})}")
+            self._set_temperature(temp)
         return self.current_temp
 
     def get_sensor_data(self) -> (float, bool):
         value: float = 0.0
         ret = False
-        raw = self.get_file_data(self.sensor_file)
-        if raw:
-            value = float(raw) / 1000
+        raw = self._read_millidegrees()
+        if raw is not None:
+            value = raw / 1000
             ret = True
-        else:
-            LogManager.logger.warning(f"Invalid sensor data {repr({'sensor': self.sensor_name, 'sensor file': self.sensor_file, 'data': raw})}")
         return value, ret
 
     def get_signature(self) -> list:
         return [self.__class__.__name__, self.chip_name, self.sensor_folder, self.sensor_feature, self.sensor_name]
 
-    def get_file_data(self, file_name: str) -> Optional[str]:
-        value: str = None
+    def close(self) -> None:
+        self._file.close()
+
+    @staticmethod
+    def read_all(hw_sensors: List['HwSensor']) -> Dict['HwSensor', float]:
+        # batched read of integer millidegrees for a list of sensors
+        temperatures: Dict[HwSensor, float] = dict()
+        for sensor in hw_sensors:
+            if not sensor.breaker.allow():
+                temperatures[sensor] = sensor.current_temp
+                continue
+            start = time.monotonic()
+            read_errors = sensor.read_errors
+            raw = sensor._read_millidegrees()
+            if raw is not None:
+                sensor._set_temperature(raw / 1000)
+            sensor._record_result(read_errors)
+            temperatures[sensor] = sensor._record_sample(sensor.current_temp, start, time.monotonic()).value
+        return temperatures
+
+    def _read_millidegrees(self) -> Optional[int]:
         try:
-            with open(file_name, 'r') as file:
-                value = file.read().strip()
+            return self._file.read_int()
         except OSError:
-            LogManager.logger.exception(f"Error getting sensor data {repr({'sensor': self.sensor_name, 'sensor file': file_name})}")
-        return value
+            LogManager.logger.exception(f"Error getting sensor data {repr({'sensor': self.sensor_name, 'sensor file': self.sensor_file})}")
+        except ValueError:
+            LogManager.logger.warning(f"Invalid sensor data {repr({'sensor': self.sensor_name, 'sensor file': self.sensor_file})}")
+        self._set_failed()
+        return None
+
+    def _set_temperature(self, temp: float) -> None:
+        LogManager.logger.debug(f"Getting sensor temperature {repr({'sensor': self.sensor_name, 'temperature': temp})}")
+        if self.current_temp == 0.0 or (10.0 < temp < 99.0):
+            self.current_temp = temp
+            self._set_updated()
+        else:
+            LogManager.logger.warning(f"Sensor temperature data out of range {repr({'sensor': self.sensor_name, 'last temp': self.current_temp, 'new temp': temp})}")
+
+
+class FileSensor(Sensor):
+
+    def __init__(self, name: str, path: str, scale: float = 1.0, offset: float = 0.0, min_value: float = 0.0, max_value: float = 100.0) -> None:
+        super().__init__()
+        self.sensor_name = name
+        self.sensor_file = path
+        self.scale = scale
+        self.offset = offset
+        self.min_value = min_value
+        self.max_value = max_value
+        self.current_temp = 0.0
+        self._file = SysfsFile(path, 64, follow_replace=not path.startswith("/sys/"))
+
+    def get_temperature(self) -> float:
+        try:
+            value = self._file.read_float() * self.scale + self.offset
+        except OSError:
+            LogManager.logger.exception(f"Error getting sensor data {repr({'sensor': self.sensor_name, 'sensor file': self.sensor_file})}")
+            self._set_failed()
+            return self.current_temp
+        except ValueError:
+            LogManager.logger.warning(f"Invalid sensor data {repr({'sensor': self.sensor_name, 'sensor file': self.sensor_file})}")
+            self._set_failed()
+            return self.current_temp
+        if self.min_value <= value <= self.max_value:
+            self.current_temp = value
+            self._set_updated()
+            LogManager.logger.debug(f"Getting sensor temperature {repr({'sensor': self.sensor_name, 'temperature': value})}")
+        else:
+            LogManager.logger.warning(f"Sensor temperature data out of range {repr({'sensor': self.sensor_name, 'last temp': self.current_temp, 'new temp': value})}")
+        return self.current_temp
+
+    def get_signature(self) -> list:
+        return [__class__.__name__, self.sensor_file, self.sensor_name]
 
+    def close(self) -> None:
+        self._file.close()
@@ -0,0 +1,77 @@
+import os
+import re
+from typing import List, Optional, Tuple
+
+from .sensor import Sensor
+from .hwsensor import SysfsFile
+from .log import LogManager
+
+PROCFS_ROOT: str = "/proc"
+
+
+class CpuLoadSensor(Sensor):
+
+    # /proc/stat grows with the number of cores
+    READ_SIZE: int = 65536
+
+    def __init__(self, cpu: str = "cpu", procfs_root: str = PROCFS_ROOT) -> None:
+        super().__init__()
+        self.cpu = cpu
+        self.stat_file = os.path.join(procfs_root, "stat")
+        if cpu == "cpu":
+            self.sensor_name = "CPU Load"
+        else:
+            self.sensor_name = f"CPU{cpu[3:]} Load"
+        self.current_temp = 0.0
+        self._file = SysfsFile(self.stat_file, self.READ_SIZE)
+        self._last_times: Optional[Tuple[int, int]] = self._read_times()
+
+    def get_temperature(self) -> float:
+        # utilization in percent since the previous read
+        times = self._read_times()
+        if times is not None:
+            if self._last_times is not None:
+                busy = times[0] - self._last_times[0]
+                total = times[1] - self._last_times[1]
+                if total > 0:
+                    self.current_temp = round(100.0 * max(0, min(busy, total)) / total, 1)
+                    self._set_updated()
+                    LogManager.logger.trace(f"Getting CPU load {repr({'sensor': self.sensor_name, 'load': self.current_temp})}")
+            self._last_times = times
+        return self.current_temp
+
+    def get_signature(self) -> list:
+        return [__class__.__name__, "procfs", self.cpu, self.sensor_name]
+
+    def close(self) -> None:
+        self._file.close()
+
+    def _read_times(self) -> Optional[Tuple[int, int]]:
+        # busy and total jiffies of the cpu line (user nice system idle iowait irq softirq steal)
+        try:
+            content = self._file.read().decode('ascii', 'replace')
+        except OSError:
+            LogManager.logger.exception(f"Error getting sensor data {repr({'sensor': self.sensor_name, 'sensor file': self.stat_file})}")
+            self._set_failed()
+            return None
+        for line in content.splitlines():
+            fields = line.split()
+            if fields and fields[0] == self.cpu:
+                try:
+                    values = [int(value) for value in fields[1:9]]
+                except ValueError:
+                    break
+                total = sum(values)
+                idle = values[3] + (values[4] if len(values) > 4 else 0)
+                return total - idle, total
+        LogManager.logger.warning(f"Invalid sensor data {repr({'sensor': self.sensor_name, 'sensor file': self.stat_file})}")
+        self._set_failed()
+        return None
+
+    @staticmethod
+    def detect_cpus(procfs_root: str = PROCFS_ROOT) -> List[str]:
+        try:
+            with open(os.path.join(procfs_root, "stat"), 'r') as stat_file:
+                return [line.split()[0] for line in stat_file if re.match(r"cpu\d+\s", line)]
+        except OSError:
+            return list()
@@ -1,16 +1,203 @@
 import subprocess
+import threading
+import time
 from subprocess import CompletedProcess, CalledProcessError
-from typing import List, Dict
+from typing import List, Dict, Optional, NamedTuple, Union
 
 from .sensor import Sensor
 from .log import LogManager
 
 SMI_DETECT_COMMAND: List[str] = ['sh', '-c', 'nvidia-smi --query-gpu=index,gpu_name --format=csv,noheader,nounits']
-SMI_SATUS_COMMAND: List[str] = ['sh', '-c', 'nvidia-smi --query-gpu=index,gpu_name,temperature.gpu,utilization.gpu,fan.speed --format=csv,noheader,nounits']
+SMI_SATUS_COMMAND: List[str] = ['nvidia-smi', '--query-gpu=index,gpu_name,temperature.gpu,utilization.gpu,fan.speed', '--format=csv,noheader,nounits']
+
+
+class GpuStatus(NamedTuple):
+    index: int
+    name: str
+    temperature: Optional[float]
+    utilization: Optional[float]
+    fan_speed: Optional[float]
+    timestamp: float
+
+    @staticmethod
+    def from_line(line: str, timestamp: float) -> Optional['GpuStatus']:
+        values = [value.strip() for value in line.split(',')]
+        if len(values) < 5:
+            return None
+        try:
+            index = int(values[0])
+        except ValueError:
+            return None
+        return GpuStatus(index, values[1], GpuStatus._to_float(values[2]), GpuStatus._to_float(values[3]), GpuStatus._to_float(values[4]), timestamp)
+
+    @staticmethod
+    def _to_float(value: str) -> Optional[float]:
+        # nvidia-smi reports unsupported values as '[N/A]' or '[Not Supported]'
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+
+class NvidiaSmiStream(object):
+
+    STALE_FACTOR: int = 5
+
+    def __init__(self, period: float = 1.0, command: Optional[List[str]] = None) -> None:
+        self.period = period
+        if command is None:
+            command = SMI_SATUS_COMMAND + ['-lms', str(int(period * 1000))]
+        self.command = command
+        self.restart_count = 0
+        self._lock = threading.Lock()
+        self._latest: Dict[int, GpuStatus] = dict()
+        self._process: Optional[subprocess.Popen] = None
+        self._reader: Optional[threading.Thread] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._last_line = 0.0
+
+    def start(self) -> None:
+        if self._watchdog is None or not self._watchdog.is_alive():
+            self._stop_event.clear()
+            self._spawn()
+            self._watchdog = threading.Thread(target=self._watch, name="cfancontrol-smi-watchdog", daemon=True)
+            self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+        self._terminate()
+
+    def get_status(self, index: int) -> Optional[GpuStatus]:
+        with self._lock:
+            return self._latest.get(index)
+
+    def get_all_status(self) -> Dict[int, GpuStatus]:
+        with self._lock:
+            return dict(self._latest)
+
+    def _spawn(self) -> None:
+        try:
+            self._process = subprocess.Popen(self.command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1)
+        except OSError as err:
+            self._process = None
+            LogManager.logger.warning(f"Problem starting nVidia status stream {repr({'command': self.command, 'error': repr(err)})}")
+            return
+        self._last_line = time.monotonic()
+        self._reader = threading.Thread(target=self._read, args=(self._process,), name="cfancontrol-smi-reader", daemon=True)
+        self._reader.start()
+        LogManager.logger.debug(f"nVidia status stream started {repr({'pid': self._process.pid, 'period': self.period})}")
+
+    def _terminate(self) -> None:
+        process = self._process
+        self._process = None
+        if process is not None:
+            try:
+                process.terminate()
+                process.wait(timeout=2.0)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+            except OSError:
+                pass
+        if self._reader is not None:
+            self._reader.join()
+            self._reader = None
+
+    def _read(self, process: subprocess.Popen) -> None:
+        for line in process.stdout:
+            if not line.strip():
+                continue
+            now = time.monotonic()
+            status = GpuStatus.from_line(line, now)
+            if status is None:
+                LogManager.logger.trace(f"Ignoring nVidia status line {repr({'line': line.strip()})}")
+                continue
+            with self._lock:
+                self._latest[status.index] = status
+                self._last_line = now
+        process.stdout.close()
+
+    def _watch(self) -> None:
+        # restart nvidia-smi if it died or stopped reporting
+        while not self._stop_event.wait(self.period):
+            process = self._process
+            with self._lock:
+                silent = time.monotonic() - self._last_line
+            if process is None or process.poll() is not None or silent > self.STALE_FACTOR * self.period:
+                self.restart_count += 1
+                LogManager.logger.warning(f"Restarting nVidia status stream {repr({'restarts': self.restart_count, 'silent': round(silent, 1)})}")
+                self._terminate()
+                if not self._stop_event.is_set():
+                    self._spawn()
+
+
+class NvidiaStatusProvider(object):
+
+    def __init__(self, timeout: float = 2.0, max_age: float = 1.0, command: Optional[List[str]] = None) -> None:
+        self.timeout = timeout
+        self.max_age = max_age
+        if command is None:
+            command = SMI_SATUS_COMMAND
+        self.command = command
+        self.query_count = 0
+        self.failure_count = 0
+        self._lock = threading.Lock()
+        self._latest: Dict[int, GpuStatus] = dict()
+        self._last_query: Optional[float] = None
+        self._is_stale = True
+
+    def invalidate(self) -> None:
+        # the next request runs a new query (called once per tick)
+        with self._lock:
+            self._is_stale = True
+
+    def get_status(self, index: int) -> Optional[GpuStatus]:
+        with self._lock:
+            self._refresh()
+            return self._latest.get(index)
+
+    def get_all_status(self) -> Dict[int, GpuStatus]:
+        with self._lock:
+            self._refresh()
+            return dict(self._latest)
+
+    def _refresh(self) -> None:
+        if not self._is_stale and self._last_query is not None and time.monotonic() - self._last_query <= self.max_age:
+            return
+        self._is_stale = False
+        self._last_query = time.monotonic()
+        self.query_count += 1
+        try:
+            command_result: CompletedProcess = subprocess.run(self.command, capture_output=True, check=True, text=True, timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            self.failure_count += 1
+            LogManager.logger.warning(f"nVidia status query timed out - using last values {repr({'timeout': self.timeout, 'failures': self.failure_count})}")
+            return
+        except CalledProcessError as cpe:
+            self.failure_count += 1
+            LogManager.logger.warning(f"Problem getting nVidia status - using last values {repr({'error': cpe.output, 'failures': self.failure_count})}")
+            return
+        except OSError as err:
+            self.failure_count += 1
+            LogManager.logger.warning(f"Problem getting nVidia status - using last values {repr({'error': repr(err), 'failures': self.failure_count})}")
+            return
+        now = time.monotonic()
+        for line in str(command_result.stdout).splitlines():
+            if not line.strip():
+                continue
+            status = GpuStatus.from_line(line, now)
+            if status is not None:
+                self._latest[status.index] = status
 
 
 class NvidiaSensor(Sensor):
 
+    status_source: Optional[Union[NvidiaSmiStream, NvidiaStatusProvider]] = None
+
     def __init__(self, index: int, device_name: str):
         super().__init__()
         self.index = index
@@ -21,28 +208,65 @@ class NvidiaSensor(Sensor):
 
     def get_temperature(self) -> float:
         try:
-            command_result: CompletedProcess = subprocess.run(SMI_SATUS_COMMAND, capture_output=True, check=True, text=True)
-            result_lines = str(command_result.stdout).splitlines()
-            for line in result_lines:
-                if not line.strip():
-                    continue
-                values = line.split(', ')
-                if int(values[0]) == self.index:
-                    temp = int(values[2])
-                    if self.current_temp == 0.0 or (10.0 <= temp <= 100.0):
-                        self.current_temp = float(temp)
-                        LogManager.logger.trace(f"Getting sensor temperature {repr({'sensor': self.sensor_name, 'temperature': self.current_temp})}")
-                    else:
-                        LogManager.logger.warning(f"Sensor temperature data out of range {repr({'sensor': self.sensor_name, 'last temp': self.current_temp, 'new temp': temp})}")
-        except CalledProcessError as cpe:
-            LogManager.logger.warning(f"Problem getting sensor data {repr({'sensor': self.sensor_name, 'error': cpe.output})}")
+            status = NvidiaSensor.get_status_source().get_status(self.index)
+            if status is not None:
+                value = self._get_value(status)
+                if value is not None:
+                    updated = self.updated
+                    self._set_value(value)
+                    if self.updated != updated:
+                        # the value is as old as the status it was taken from
+                        self._set_updated(status.timestamp)
         except BaseException:
             LogManager.logger.exception(f"Error getting sensor data {repr({'sensor': self.sensor_name})}")
+            self._set_failed()
         return self.current_temp
 
     def get_signature(self) -> list:
         return [__class__.__name__, self.device_description, self.index, self.sensor_name]
 
+    def _get_value(self, status: GpuStatus) -> Optional[float]:
+        return status.temperature
+
+    def _set_value(self, temp: float) -> None:
+        if self.current_temp == 0.0 or (10.0 <= temp <= 100.0):
+            self.current_temp = float(temp)
+            self._set_updated()
+            LogManager.logger.trace(f"Getting sensor temperature {repr({'sensor': self.sensor_name, 'temperature': self.current_temp})}")
+        else:
+            LogManager.logger.warning(f"Sensor temperature data out of range {repr({'sensor': self.sensor_name, 'last temp': self.current_temp, 'new temp': temp})}")
+
+    @staticmethod
+    def get_status_source():
+        # all GPU sensors share one source of status data
+        if NvidiaSensor.status_source is None:
+            NvidiaSensor.status_source = NvidiaStatusProvider()
+        return NvidiaSensor.status_source
+
+    @staticmethod
+    def use_status_provider(timeout: float, max_age: float, command: Optional[List[str]] = None) -> NvidiaStatusProvider:
+        NvidiaSensor.stop_status_stream()
+        NvidiaSensor.status_source = NvidiaStatusProvider(timeout, max_age, command)
+        return NvidiaSensor.status_source
+
+    @staticmethod
+    def invalidate_status() -> None:
+        if isinstance(NvidiaSensor.status_source, NvidiaStatusProvider):
+            NvidiaSensor.status_source.invalidate()
+
+    @staticmethod
+    def start_status_stream(period: float, command: Optional[List[str]] = None) -> NvidiaSmiStream:
+        if not isinstance(NvidiaSensor.status_source, NvidiaSmiStream):
+            NvidiaSensor.status_source = NvidiaSmiStream(period, command)
+            NvidiaSensor.status_source.start()
+        return NvidiaSensor.status_source
+
+    @staticmethod
+    def stop_status_stream() -> None:
+        if isinstance(NvidiaSensor.status_source, NvidiaSmiStream):
+            NvidiaSensor.status_source.stop()
+            NvidiaSensor.status_source = None
+
     @staticmethod
     def detect_gpus() -> List['NvidiaSensor']:
         detected_gpus = []
@@ -58,3 +282,53 @@ class NvidiaSensor(Sensor):
         except CalledProcessError:
             LogManager.logger.trace(f"No nVidia GPU found")
         return detected_gpus
+
+    @staticmethod
+    def detect_gpu_sensors(gpu: 'NvidiaSensor', gpu_status: Dict[int, GpuStatus]) -> List['NvidiaSensor']:
+        # utilization and fan speed are added if the status query of all GPUs reports them
+        gpu_sensors = []
+        status = gpu_status.get(gpu.index)
+        if status is not None:
+            if status.utilization is not None:
+                gpu_sensors.append(NvidiaUtilizationSensor(gpu.index, gpu.device_name))
+            if status.fan_speed is not None:
+                gpu_sensors.append(NvidiaFanSensor(gpu.index, gpu.device_name))
+        return gpu_sensors
+
+
+class NvidiaUtilizationSensor(NvidiaSensor):
+
+    def __init__(self, index: int, device_name: str):
+        super().__init__(index, device_name)
+        self.sensor_name = "nVidia GPU Load"
+
+    def get_signature(self) -> list:
+        return [__class__.__name__, self.device_description, self.index, self.sensor_name]
+
+    def _get_value(self, status: GpuStatus) -> Optional[float]:
+        return status.utilization
+
+    def _set_value(self, value: float) -> None:
+        # percent, so full load runs a fan curve at its end
+        self.current_temp = min(max(float(value), 0.0), 100.0)
+        self._set_updated()
+        LogManager.logger.trace(f"Getting GPU utilization {repr({'sensor': self.sensor_name, 'utilization': self.current_temp})}")
+
+
+class NvidiaFanSensor(NvidiaSensor):
+
+    def __init__(self, index: int, device_name: str):
+        super().__init__(index, device_name)
+        self.sensor_name = "nVidia GPU Fan"
+
+    def get_signature(self) -> list:
+        return [__class__.__name__, self.device_description, self.index, self.sensor_name]
+
+    def _get_value(self, status: GpuStatus) -> Optional[float]:
+        return status.fan_speed
+
+    def _set_value(self, value: float) -> None:
+        # some GPUs report more than 100 % while spinning up
+        self.current_temp = min(max(float(value), 0.0), 100.0)
+        self._set_updated()
+        LogManager.logger.trace(f"Getting GPU fan speed {repr({'sensor': self.sensor_name, 'fan speed': self.current_temp})}")
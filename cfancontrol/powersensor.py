@@ -0,0 +1,86 @@
+import os
+import re
+import time
+from typing import List, Optional, Tuple
+
+from .sensor import Sensor
+from .hwsensor import SysfsFile
+from .log import LogManager
+
+POWERCAP_ROOT: str = "/sys/class/powercap"
+
+
+class RaplPowerSensor(Sensor):
+
+    def __init__(self, zone_path: str, zone_name: str) -> None:
+        super().__init__()
+        self.zone_path = zone_path
+        self.zone = os.path.basename(zone_path)
+        self.zone_name = zone_name
+        self.sensor_name = f"RAPL {zone_name}"
+        self.current_temp = 0.0
+        self.max_energy = self._read_max_energy()
+        self._file = SysfsFile(os.path.join(zone_path, "energy_uj"))
+        self._last_energy: Optional[Tuple[int, float]] = self._read_energy()
+
+    def get_temperature(self) -> float:
+        # average power in watts since the previous read
+        energy = self._read_energy()
+        if energy is not None:
+            if self._last_energy is not None and energy[1] > self._last_energy[1]:
+                delta = energy[0] - self._last_energy[0]
+                if delta < 0:
+                    # the energy counter wrapped around
+                    delta += self.max_energy
+                if delta >= 0:
+                    self.current_temp = round(delta / (energy[1] - self._last_energy[1]) / 1000000, 1)
+                    self._set_updated()
+                    LogManager.logger.trace(f"Getting package power {repr({'sensor': self.sensor_name, 'power': self.current_temp})}")
+            self._last_energy = energy
+        return self.current_temp
+
+    def get_signature(self) -> list:
+        return [__class__.__name__, "powercap", self.zone, self.sensor_name]
+
+    def close(self) -> None:
+        self._file.close()
+
+    def _read_energy(self) -> Optional[Tuple[int, float]]:
+        try:
+            return self._file.read_int(), time.monotonic()
+        except OSError:
+            LogManager.logger.exception(f"Error getting sensor data {repr({'sensor': self.sensor_name, 'sensor file': self._file.file_name})}")
+        except ValueError:
+            LogManager.logger.warning(f"Invalid sensor data {repr({'sensor': self.sensor_name, 'sensor file': self._file.file_name})}")
+        self._set_failed()
+        return None
+
+    def _read_max_energy(self) -> int:
+        try:
+            with open(os.path.join(self.zone_path, "max_energy_range_uj"), 'r') as max_file:
+                return int(max_file.read())
+        except (OSError, ValueError):
+            return 0
+
+    @staticmethod
+    def detect_zones(powercap_root: str = POWERCAP_ROOT) -> List['RaplPowerSensor']:
+        # top level RAPL zones are the packages (intel-rapl:0, intel-rapl:1, ...)
+        zones: List[RaplPowerSensor] = list()
+        if not os.path.isdir(powercap_root):
+            return zones
+        entries = [entry for entry in os.listdir(powercap_root) if re.fullmatch(r"intel-rapl:\d+", entry)]
+        for entry in sorted(entries, key=lambda name: int(name.split(':')[1])):
+            zone_path = os.path.join(powercap_root, entry)
+            if not os.access(os.path.join(zone_path, "energy_uj"), os.R_OK):
+                # energy counters are only readable by root on recent kernels
+                LogManager.logger.debug(f"RAPL zone not readable {repr({'zone': entry})}")
+                continue
+            try:
+                with open(os.path.join(zone_path, "name"), 'r') as name_file:
+                    zone_name = name_file.read().strip()
+                    if zone_name.startswith("package"):
+                        zone_name = "Package " + zone_name.split('-')[-1]
+            except OSError:
+                zone_name = entry
+            zones.append(RaplPowerSensor(zone_path, zone_name))
+        return zones
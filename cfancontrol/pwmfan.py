@@ -1,17 +1,24 @@
 
-from .sensor import Sensor
+from typing import Optional
+
+from .sensor import Sensor, SensorReadCache, VirtualSensor
+from .sampler import SensorSampler
 from .fancurve import FanCurve, FanMode, TempRange, MAXPWM
 from .log import LogManager
 
 
 class PWMFan:
 
+    sampler: Optional[SensorSampler] = None
+
     def __init__(self, name: str, curve: FanCurve, sensor: Sensor) -> None:
         self.fan_name = name
         self.fan_curve: FanCurve = curve
         self.temp_sensor: Sensor = sensor
         self.pwm = 0
         self.temperature = 0.0
+        self.interval: Optional[float] = None
+        self.next_update: float = 0.0
 
     def get_current_pwm(self) -> int:
         return self.pwm
@@ -20,17 +27,64 @@ class PWMFan:
         self.pwm = pwm
         return
 
+    def set_interval(self, interval: Optional[float]) -> None:
+        if interval is not None and interval > 0.0:
+            self.interval = float(interval)
+        else:
+            self.interval = None
+        self.next_update = 0.0
+
+    def mark_due(self) -> None:
+        self.next_update = 0.0
+
+    def is_due(self, now: float) -> bool:
+        return now >= self.next_update
+
+    def schedule_next_update(self, now: float, default_interval: float) -> None:
+        # advance from the previous due time, so periods that are not a multiple of the loop interval are kept on average
+        interval = self.interval or default_interval
+        if self.next_update + interval <= now:
+            # first update or far behind, start a new schedule
+            self.next_update = now + interval
+        else:
+            self.next_update += interval
+
     def get_current_pwm_as_percentage(self) -> int:
         return FanCurve.pwm_to_percentage(self.pwm)
 
-    def get_current_temp(self) -> float:
-        self.temperature = self.temp_sensor.get_temperature()
+    def get_current_temp(self, sensor_cache: Optional[SensorReadCache] = None) -> float:
+        self.temperature = PWMFan.read_sensor(self.temp_sensor, sensor_cache)
         return self.temperature
 
+    @staticmethod
+    def read_sensor(sensor: Sensor, sensor_cache: Optional[SensorReadCache] = None) -> float:
+        if isinstance(sensor, VirtualSensor):
+            # sources are shared with all other channels and virtual sensors
+            return sensor.evaluate(lambda source: PWMFan.read_sensor(source, sensor_cache))
+        temperature = None
+        if PWMFan.sampler is not None:
+            # sampled sensors are read from the buffer without any I/O
+            temperature = PWMFan.sampler.get_temperature(sensor)
+        if temperature is None:
+            if sensor_cache is not None:
+                temperature = sensor_cache.get_temperature(sensor)
+            else:
+                temperature = sensor.read().value
+        return temperature
+
     def get_fan_status(self) -> (FanMode, int, int, float):
         return self.fan_curve.get_fan_mode(), self.get_current_pwm(), self.get_current_pwm_as_percentage(), self.get_current_temp()
 
-    def update_pwm(self, current_pwm: int) -> (bool, int, int, float):
+    def needs_temperature(self) -> bool:
+        return self.fan_curve.get_fan_mode() == FanMode.Curve
+
+    def update_pwm(self, current_pwm: int, sensor_cache: Optional[SensorReadCache] = None) -> (bool, int, int, float):
+        temperature = 0.0
+        if self.needs_temperature():
+            temperature = self.get_current_temp(sensor_cache)
+        return self.evaluate_pwm(current_pwm, temperature)
+
+    def evaluate_pwm(self, current_pwm: int, temperature: float) -> (bool, int, int, float):
         new_pwm: int
         pwm_percent: int
         temp: float
@@ -55,21 +109,29 @@ class PWMFan:
             new_pwm = int(pwm_float)
             pwm_percent = self.fan_curve.pwm_to_percentage(new_pwm)
         else:
-            temp = self.get_current_temp()
+            temp = temperature
             temp_range = self.fan_curve.get_range_from_temp(temp)
 
+            if temp_range is None and self.fan_curve.get_ranges() and temp >= self.fan_curve.get_last_range().high_temp:
+                # the ranges are open at the top, so values at the end of the curve (e.g. 100 % load) use the end of the last range
+                temp_range = self.fan_curve.get_last_range()
+
             if temp_range is None:
                 LogManager.logger.warning(f"No suitable temperature range found {repr({'fan': self.fan_name, 'temperature': str(temp)})}")
-                return False, 0, 0
+                return False, 0, 0, temp
 
             if temp < temp_range.low_temp:
                 temp = temp_range.low_temp
             if temp_range.hysteresis > 0.0:
                 temp = temp + temp_range.hysteresis
 
-            percentile = (temp - temp_range.low_temp) / (temp_range.high_temp - temp_range.low_temp)
-            pwm_float = temp_range.pwm_start + (percentile * (temp_range.pwm_end - temp_range.pwm_start))
-            new_pwm = int(pwm_float)
+            if temp >= temp_range.high_temp or temp_range.high_temp == temp_range.low_temp:
+                # at the end of the range, which may be a vertical segment of the curve without any width
+                new_pwm = int(temp_range.pwm_end)
+            else:
+                percentile = (temp - temp_range.low_temp) / (temp_range.high_temp - temp_range.low_temp)
+                pwm_float = temp_range.pwm_start + (percentile * (temp_range.pwm_end - temp_range.pwm_start))
+                new_pwm = int(pwm_float)
             pwm_percent = self.fan_curve.pwm_to_percentage(new_pwm)
 
         if new_pwm != self.pwm:
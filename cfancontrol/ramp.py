@@ -0,0 +1,135 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .fancurve import MAXPERCENTAGE
+from .log import LogManager
+from .breaker import DeviceUnavailableError
+
+
+class Ramp(object):
+
+    def __init__(self, current: int, target: int) -> None:
+        self.current: int = current
+        self.target: int = target
+
+    def next_duty(self, step: int) -> int:
+        if self.target >= self.current:
+            return min(self.current + step, self.target)
+        return max(self.current - step, self.target)
+
+    def is_done(self) -> bool:
+        return self.current == self.target
+
+
+class RampScheduler(object):
+
+    step: int
+    duration: float
+
+    def __init__(self, name: str, write_function: Callable[[str, int], None], step: int = 10, duration: float = 0.25,
+                 failure_function: Optional[Callable[[str, int], None]] = None) -> None:
+        self.name = name
+        self._write_function = write_function
+        self._failure_function = failure_function
+        self._condition = threading.Condition()
+        self._ramps: Dict[str, Ramp] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._is_stopping = False
+        self.configure(step, duration)
+
+    def configure(self, step: int, duration: float) -> None:
+        # step in percent of duty, duration of a full ramp from 0% to 100% in seconds
+        with self._condition:
+            self.step = max(1, min(int(step), MAXPERCENTAGE))
+            self.duration = max(0.0, float(duration))
+
+    def get_step_interval(self) -> float:
+        return self.duration * self.step / MAXPERCENTAGE
+
+    def set_target(self, channel: str, current_percent: int, new_percent: int) -> None:
+        with self._condition:
+            ramp = self._ramps.get(channel)
+            if ramp is None:
+                self._ramps[channel] = Ramp(current_percent, new_percent)
+            elif ramp.current == new_percent:
+                # the fan already runs at the new target, so there is nothing left to write
+                LogManager.logger.trace(f"Dropping fan speed ramp {repr({'controller': self.name, 'channel': channel, 'duty': ramp.current, 'old target': ramp.target})}")
+                del self._ramps[channel]
+            elif ramp.target != new_percent:
+                LogManager.logger.trace(f"Retargeting fan speed ramp {repr({'controller': self.name, 'channel': channel, 'duty': ramp.current, 'old target': ramp.target, 'new target': new_percent})}")
+                ramp.target = new_percent
+            self._start()
+            self._condition.notify_all()
+
+    def get_target(self, channel: str) -> Optional[int]:
+        with self._condition:
+            ramp = self._ramps.get(channel)
+            if ramp:
+                return ramp.target
+        return None
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._ramps, timeout)
+
+    def stop(self) -> None:
+        with self._condition:
+            self._is_stopping = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._condition:
+            self._ramps.clear()
+            self._is_stopping = False
+            self._condition.notify_all()
+
+    def _start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="cfancontrol-ramp", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        # all active ramps advance together on one timeline
+        next_step = time.monotonic()
+        while True:
+            with self._condition:
+                if not self._ramps and not self._is_stopping:
+                    self._condition.wait()
+                    next_step = time.monotonic()
+                if self._is_stopping:
+                    break
+                delay = next_step - time.monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                steps: List[Tuple[str, int]] = [(channel, ramp.next_duty(self.step)) for channel, ramp in self._ramps.items()]
+                interval = self.get_step_interval()
+            for channel, duty in steps:
+                success = True
+                try:
+                    LogManager.logger.trace(f"Adjusting fan speed {repr({'controller': self.name, 'channel': channel, 'duty': duty})}")
+                    self._write_function(channel, duty)
+                except DeviceUnavailableError:
+                    success = False
+                    LogManager.logger.debug(f"Fan controller unavailable - dropping ramp {repr({'controller': self.name, 'channel': channel})}")
+                except BaseException:
+                    success = False
+                    LogManager.logger.exception(f"Error in setting fan speed {repr({'controller': self.name, 'channel': channel})}")
+                last_duty: Optional[int] = None
+                with self._condition:
+                    ramp = self._ramps.get(channel)
+                    if ramp is not None:
+                        if success:
+                            ramp.current = duty
+                        else:
+                            last_duty = ramp.current
+                        if not success or ramp.is_done():
+                            del self._ramps[channel]
+                if last_duty is not None and self._failure_function is not None:
+                    # report the duty the fan is still running at, so the setpoint is sent again
+                    self._failure_function(channel, last_duty)
+            with self._condition:
+                self._condition.notify_all()
+            next_step = max(next_step + interval, time.monotonic())
@@ -0,0 +1,164 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .settings import Config
+from .sensor import Sensor, DummySensor, VirtualSensor
+from .hwsensor import HwSensor
+from .devicesensor import AIODeviceSensor
+from .nvidiasensor import NvidiaSensor
+from .log import LogManager
+
+
+class SampleBuffer(object):
+
+    def __init__(self, size: int) -> None:
+        self.size = max(1, int(size))
+        self._lock = threading.Lock()
+        self._values = np.zeros(self.size, dtype=np.float64)
+        self._timestamps = np.zeros(self.size, dtype=np.float64)
+        self._index = 0
+        self._count = 0
+
+    def add(self, value: float, timestamp: float) -> None:
+        with self._lock:
+            self._values[self._index] = value
+            self._timestamps[self._index] = timestamp
+            self._index = (self._index + 1) % self.size
+            self._count = min(self._count + 1, self.size)
+
+    def get_count(self) -> int:
+        return self._count
+
+    def get_latest(self) -> Optional[Tuple[float, float]]:
+        with self._lock:
+            if self._count == 0:
+                return None
+            last = (self._index - 1) % self.size
+            return float(self._values[last]), float(self._timestamps[last])
+
+    def get_average(self, count: int) -> Optional[float]:
+        with self._lock:
+            count = min(max(1, count), self._count)
+            if count == 0:
+                return None
+            indices = (self._index - 1 - np.arange(count)) % self.size
+            return float(np.mean(self._values[indices]))
+
+
+class SensorSampler(object):
+
+    def __init__(self, buffer_size: int = 120, smoothing: int = 1) -> None:
+        self.buffer_size = buffer_size
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._buffers: Dict[Sensor, SampleBuffer] = dict()
+        self._periods: Dict[Sensor, float] = dict()
+        self._next_samples: Dict[Sensor, float] = dict()
+        self.sample_count = 0
+
+    def add_sensor(self, sensor: Sensor, period: Optional[float] = None) -> None:
+        if period is None:
+            period = self.get_sample_period(sensor)
+        with self._lock:
+            if sensor not in self._buffers:
+                self._buffers[sensor] = SampleBuffer(self.buffer_size)
+            self._periods[sensor] = max(0.1, period)
+            self._next_samples[sensor] = 0.0
+
+    def add_sensors(self, sensors: List[Sensor]) -> None:
+        for sensor in sensors:
+            # virtual sensors are evaluated from the samples of their sources
+            if not isinstance(sensor, (DummySensor, VirtualSensor)):
+                self.add_sensor(sensor)
+
+    def has_sensor(self, sensor: Sensor) -> bool:
+        return sensor in self._buffers
+
+    def get_buffer(self, sensor: Sensor) -> Optional[SampleBuffer]:
+        return self._buffers.get(sensor)
+
+    def get_latest(self, sensor: Sensor) -> Optional[float]:
+        buffer = self._buffers.get(sensor)
+        if buffer is not None:
+            latest = buffer.get_latest()
+            if latest is not None:
+                return latest[0]
+        return None
+
+    def get_age(self, sensor: Sensor, now: Optional[float] = None) -> Optional[float]:
+        buffer = self._buffers.get(sensor)
+        if buffer is not None:
+            latest = buffer.get_latest()
+            if latest is not None:
+                return (now or time.monotonic()) - latest[1]
+        return None
+
+    def get_temperature(self, sensor: Sensor) -> Optional[float]:
+        # latest value or the mean of the last samples, without any sensor I/O
+        buffer = self._buffers.get(sensor)
+        if buffer is not None:
+            return buffer.get_average(self.smoothing)
+        return None
+
+    @staticmethod
+    def get_sample_period(sensor: Sensor) -> float:
+        # sysfs files are cheap, USB HID devices and nvidia-smi are not
+        if isinstance(sensor, HwSensor):
+            return Config.sample_period_sysfs
+        if isinstance(sensor, NvidiaSensor):
+            return Config.sample_period_gpu
+        if isinstance(sensor, AIODeviceSensor):
+            return Config.sample_period_device
+        return Config.sample_period_sysfs
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="cfancontrol-sampler", daemon=True)
+            self._thread.start()
+            LogManager.logger.debug(f"Sensor sampler started {repr({'sensors': len(self._buffers)})}")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            LogManager.logger.debug(f"Sensor sampler stopped {repr({'samples': self.sample_count})}")
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            with self._lock:
+                due = [sensor for sensor, next_sample in self._next_samples.items() if next_sample <= now]
+            for sensor in due:
+                self._sample(sensor)
+                if self._stop_event.is_set():
+                    return
+            with self._lock:
+                next_sample = min(self._next_samples.values(), default=time.monotonic() + 1.0)
+            self._stop_event.wait(max(0.0, next_sample - time.monotonic()))
+
+    def _sample(self, sensor: Sensor) -> None:
+        try:
+            sample = sensor.read()
+        except BaseException:
+            LogManager.logger.exception(f"Error sampling sensor {repr({'sensor': sensor.get_name()})}")
+            sample = None
+        now = time.monotonic()
+        with self._lock:
+            buffer = self._buffers.get(sensor)
+            if buffer is None:
+                return
+            # only new values go into the buffer, so its timestamps show the age of the data
+            if sample is not None and sample.is_fresh:
+                buffer.add(sample.value, sample.timestamp)
+                self.sample_count += 1
+            self._next_samples[sensor] = now + self._periods[sensor]
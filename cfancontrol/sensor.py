@@ -1,20 +1,129 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from .breaker import CircuitBreaker
+
+
+class SensorSample(NamedTuple):
+    value: float
+    timestamp: float
+    duration: float
+    is_fresh: bool
+
+
+class LatencyStatistics(object):
+
+    WINDOW: int = 64
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._durations: Deque[float] = deque(maxlen=self.WINDOW)
+        self.read_count = 0
+        self.stale_count = 0
+        self.slow_streak = 0
+
+    def add(self, duration: float, is_fresh: bool, budget: float) -> None:
+        with self._lock:
+            self._durations.append(duration)
+            self.read_count += 1
+            if not is_fresh:
+                self.stale_count += 1
+            if budget > 0.0 and duration > budget:
+                self.slow_streak += 1
+            else:
+                self.slow_streak = 0
+
+    def get_percentile(self, percentile: float) -> float:
+        with self._lock:
+            durations = sorted(self._durations)
+        if not durations:
+            return 0.0
+        return durations[min(len(durations) - 1, int(round(percentile / 100 * (len(durations) - 1))))]
+
+    def get_statistics(self) -> Dict[str, float]:
+        return {'reads': self.read_count, 'stale': self.stale_count, 'slow streak': self.slow_streak,
+                'p50': self.get_percentile(50), 'p90': self.get_percentile(90), 'p99': self.get_percentile(99), 'max': self.get_percentile(100)}
+
 
 class Sensor(object):
 
     sensor_name: str
+    # latency budget of a single read in seconds (0 = no budget)
+    latency_budget: float = 0.0
 
     def __init__(self):
-        pass
+        self.updated: float = 0.0
+        self.read_errors = 0
+        self.last_sample: Optional[SensorSample] = None
+        self.latency = LatencyStatistics()
+        self._breaker: Optional[CircuitBreaker] = None
 
     def get_name(self) -> str:
         return self.sensor_name
 
+    @property
+    def breaker(self) -> CircuitBreaker:
+        # created on first use as subclasses set their name after this constructor
+        if self._breaker is None:
+            self._breaker = CircuitBreaker(self.get_name())
+        return self._breaker
+
+    def get_breaker(self) -> Optional[CircuitBreaker]:
+        # none until the sensor was read for the first time
+        return self._breaker
+
     def get_temperature(self) -> float:
         raise NotImplementedError()
 
+    def read(self) -> SensorSample:
+        # timed read that tells a new value from the last value returned after an error
+        start = time.monotonic()
+        if not self.breaker.allow():
+            # the sensor keeps failing, so return the last value without trying
+            return SensorSample(getattr(self, "current_temp", 0.0), start, 0.0, False)
+        read_errors = self.read_errors
+        value = self.get_temperature()
+        self._record_result(read_errors)
+        return self._record_sample(value, start, time.monotonic())
+
+    def get_age(self, now: Optional[float] = None) -> float:
+        if now is None:
+            now = time.monotonic()
+        return now - self.updated
+
+    def is_stale(self, max_age: float, now: Optional[float] = None) -> bool:
+        return max_age > 0.0 and self.get_age(now) > max_age
+
+    def _set_failed(self) -> None:
+        self.read_errors += 1
+
+    def _record_result(self, read_errors: int) -> None:
+        if self.read_errors > read_errors:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _set_updated(self, timestamp: Optional[float] = None) -> None:
+        if timestamp is None:
+            timestamp = time.monotonic()
+        self.updated = timestamp
+
+    def _record_sample(self, value: float, start: float, end: float) -> SensorSample:
+        # a sample is fresh if the sensor got a new value since the previous sample
+        is_fresh = self.last_sample is None or self.updated > self.last_sample.timestamp
+        sample = SensorSample(value, end, end - start, is_fresh and self.updated > 0.0)
+        self.latency.add(sample.duration, sample.is_fresh, Sensor.latency_budget)
+        self.last_sample = sample
+        return sample
+
     def get_signature(self) -> list:
         raise NotImplementedError()
 
+    def close(self) -> None:
+        pass
+
 
 class DummySensor(Sensor):
 
@@ -24,7 +133,126 @@ class DummySensor(Sensor):
         self.current_temp = 0.0
 
     def get_temperature(self) -> float:
+        self._set_updated()
         return self.current_temp
 
     def get_signature(self) -> list:
-        return [__class__.__name__, "dummy", "", self.sensor_name, 0]
\ No newline at end of file
+        return [__class__.__name__, "dummy", "", self.sensor_name, 0]
+
+
+class VirtualSensor(Sensor):
+
+    REDUCERS: List[str] = ['max', 'min', 'mean', 'weighted']
+
+    def __init__(self, name: str, sources: List[Sensor], reducer: str = 'max', weights: Optional[List[float]] = None) -> None:
+        super().__init__()
+        if not sources:
+            raise ValueError("virtual sensor without source sensors")
+        if reducer not in self.REDUCERS:
+            raise ValueError(f"unknown reducer '{reducer}'")
+        if weights is None:
+            weights = [1.0] * len(sources)
+        if len(weights) != len(sources):
+            raise ValueError("number of weights does not match number of source sensors")
+        self.sensor_name = name
+        self.sources: List[Sensor] = list(sources)
+        self.reducer = reducer
+        self.weights: List[float] = [float(weight) for weight in weights]
+        self.current_temp = 0.0
+
+    def get_temperature(self) -> float:
+        return self.evaluate(lambda sensor: sensor.get_temperature())
+
+    def evaluate(self, read_function: Callable[[Sensor], float]) -> float:
+        # the sources are read through the given function, so cached or sampled values can be shared
+        values = [read_function(sensor) for sensor in self.sources]
+        # a virtual sensor is as fresh as its oldest source
+        self.updated = min(sensor.updated for sensor in self.sources)
+        if self.reducer == 'max':
+            self.current_temp = max(values)
+        elif self.reducer == 'min':
+            self.current_temp = min(values)
+        elif self.reducer == 'mean':
+            self.current_temp = sum(values) / len(values)
+        else:
+            self.current_temp = sum(weight * value for weight, value in zip(self.weights, values))
+        return self.current_temp
+
+    def get_leaf_sensors(self) -> List[Sensor]:
+        leaves: List[Sensor] = list()
+        for sensor in self.sources:
+            if isinstance(sensor, VirtualSensor):
+                leaves.extend(sensor.get_leaf_sensors())
+            else:
+                leaves.append(sensor)
+        return leaves
+
+    def get_signature(self) -> list:
+        return [__class__.__name__, self.sensor_name, self.reducer, [sensor.get_signature() for sensor in self.sources], self.weights]
+
+    @staticmethod
+    def definition_from_signature(signature: list) -> Dict:
+        return {'name': signature[1], 'reducer': signature[2], 'sources': signature[3], 'weights': signature[4]}
+
+
+class SensorReadCache(object):
+
+    hits: int
+    misses: int
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: Dict[Sensor, float] = {}
+        self._pending: Dict[Sensor, threading.Event] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def reset_statistics(self) -> None:
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def get_statistics(self) -> Tuple[int, int]:
+        return self.hits, self.misses
+
+    def add_readings(self, readings: Dict[Sensor, float]) -> None:
+        with self._lock:
+            for sensor, temperature in readings.items():
+                if sensor not in self._values:
+                    self._values[sensor] = temperature
+                    self.misses += 1
+
+    def get_temperature(self, sensor: Sensor) -> float:
+        with self._lock:
+            if sensor in self._values:
+                self.hits += 1
+                return self._values[sensor]
+            pending = self._pending.get(sensor)
+            if pending is None:
+                pending = threading.Event()
+                self._pending[sensor] = pending
+                self.misses += 1
+                is_reader = True
+            else:
+                is_reader = False
+        if not is_reader:
+            # another thread is reading the same sensor right now
+            pending.wait()
+            with self._lock:
+                if sensor in self._values:
+                    self.hits += 1
+                    return self._values[sensor]
+            return sensor.read().value
+        try:
+            temperature = sensor.read().value
+            with self._lock:
+                self._values[sensor] = temperature
+        finally:
+            with self._lock:
+                self._pending.pop(sensor, None)
+            pending.set()
+        return temperature
@@ -1,22 +1,82 @@
+import os
 from typing import Optional, List, Dict
 
 import liquidctl    # liquidctl module
-import sensors      # PySensors module
+try:
+    import sensors  # PySensors module
+except ImportError:
+    sensors = None
 
-from .settings import Environment
-from .sensor import Sensor, DummySensor
-from .hwsensor import HwSensor
+from .settings import Environment, Config
+from .sensor import Sensor, DummySensor, VirtualSensor
+from .hwsensor import HwSensor, FileSensor
+from .hwmon import HwmonDiscovery, HWMON_ROOT
 from .devicesensor import KrakenX3Sensor, HydroPlatinumSensor
-from .nvidiasensor import NvidiaSensor
+from .nvidiasensor import NvidiaSensor, NvidiaStatusProvider, GpuStatus
+from .loadsensor import CpuLoadSensor
+from .powersensor import RaplPowerSensor
 from .log import LogManager
 
 
 class SensorManager(object):
     # initialize list of sensors with dummy sensor
     system_sensors: List = [DummySensor()]
+    # signature index and integer ids (position in the list of system sensors)
+    _signature_index: Dict[tuple, Sensor] = dict()
+    _sensor_ids: Dict[Sensor, int] = dict()
+    _indexed_sensors: Optional[List] = None
 
     @staticmethod
     def identify_system_sensors():
+        if Config.sensor_discovery == 'sysfs' or sensors is None:
+            SensorManager.identify_hwmon_sensors()
+        else:
+            SensorManager.identify_libsensors_sensors()
+
+        # append sensors for AIOs
+        devices = liquidctl.find_liquidctl_devices()
+        for dev in devices:
+            if type(dev) == liquidctl.driver.kraken3.KrakenX3:
+                LogManager.logger.info(f"AIO device found {repr({'device': dev.description})}")
+                SensorManager.add_sensor(KrakenX3Sensor(dev))
+            elif type(dev) == liquidctl.driver.hydro_platinum.HydroPlatinum:
+                LogManager.logger.info(f"AIO device found {repr({'device': dev.description})}")
+                SensorManager.add_sensor(HydroPlatinumSensor(dev))
+
+        # append sensors of GPUs (if found)
+        nvidia_gpus: List[NvidiaSensor] = NvidiaSensor.detect_gpus()
+        gpu_status: Dict[int, GpuStatus] = dict()
+        if nvidia_gpus:
+            # one status query of all GPUs at startup, as a freshly started status stream has not reported anything yet
+            gpu_status = NvidiaStatusProvider(Config.nvidia_timeout).get_all_status()
+            # all GPU sensors are fed by either one long-lived nvidia-smi or one query per tick
+            if Config.nvidia_backend == 'stream':
+                NvidiaSensor.start_status_stream(Config.nvidia_period)
+            else:
+                NvidiaSensor.use_status_provider(Config.nvidia_timeout, Config.nvidia_period)
+        for gpu in nvidia_gpus:
+            LogManager.logger.info(f"nVidia GPU found {repr({'id': gpu.index, 'device': gpu.device_name})}")
+            SensorManager.add_sensor(gpu)
+            for gpu_sensor in NvidiaSensor.detect_gpu_sensors(gpu, gpu_status):
+                SensorManager.add_sensor(gpu_sensor)
+
+        # append CPU load sensors
+        SensorManager.identify_cpu_load_sensors(Config.procfs_root)
+
+        # append package power sensors
+        if Config.rapl_sensors:
+            SensorManager.identify_rapl_sensors(Config.powercap_root)
+
+        # append file sensors from the settings file
+        for definition in Config.file_sensors:
+            SensorManager.add_file_sensor(definition)
+
+        # append virtual sensors from the settings file
+        for definition in Config.virtual_sensors:
+            SensorManager.add_virtual_sensor(definition)
+
+    @staticmethod
+    def identify_libsensors_sensors():
         # get sensors via PySensors and libsensors.so (part of lm_sensors) -> config in /.config/cfancontrol/sensors3.conf or /etc/sensors3.conf
         sensors.init(bytes(Environment.sensors_config_file, "utf-8"))
         try:
@@ -31,32 +91,138 @@ class SensorManager(object):
                             # no label set for feature, so add prefix
                             label = chip.prefix.decode('utf-8') + "_" + feature.label
                         LogManager.logger.debug(f"Adding feature {repr({'chip': chip.prefix.decode('utf-8'), 'feature name': name, 'label': label})}")
-                        SensorManager.system_sensors.append(HwSensor(str(chip), chip.path.decode('utf-8'), name, label))
+                        SensorManager.add_sensor(HwSensor(str(chip), chip.path.decode('utf-8'), name, label))
         finally:
             sensors.cleanup()
 
-        # append sensors for AIOs
-        devices = liquidctl.find_liquidctl_devices()
-        for dev in devices:
-            if type(dev) == liquidctl.driver.kraken3.KrakenX3:
-                LogManager.logger.info(f"AIO device found {repr({'device': dev.description})}")
-                SensorManager.system_sensors.append(KrakenX3Sensor(dev))
-            elif type(dev) == liquidctl.driver.hydro_platinum.HydroPlatinum:
-                LogManager.logger.info(f"AIO device found {repr({'device': dev.description})}")
-                SensorManager.system_sensors.append(HydroPlatinumSensor(dev))
+    @staticmethod
+    def identify_hwmon_sensors(hwmon_root: str = HWMON_ROOT):
+        # get sensors directly from sysfs -> labels and ignores are still taken from sensors3.conf
+        for hw_sensor in HwmonDiscovery.discover_sensors(Environment.sensors_config_file, hwmon_root):
+            SensorManager.add_sensor(hw_sensor)
 
-        # append sensors of GPUs (if found)
-        nvidia_gpus: List[NvidiaSensor] = NvidiaSensor.detect_gpus()
-        for gpu in nvidia_gpus:
-            LogManager.logger.info(f"nVidia GPU found {repr({'id': gpu.index, 'device': gpu.device_name})}")
-            SensorManager.system_sensors.append(gpu)
+    @staticmethod
+    def identify_cpu_load_sensors(procfs_root: str):
+        # 'total' adds the load of all cores, 'cores' adds one sensor per core as well
+        if Config.cpu_load_sensors not in ('total', 'cores'):
+            return
+        if not os.path.isfile(os.path.join(procfs_root, "stat")):
+            LogManager.logger.warning(f"CPU load not available {repr({'procfs': procfs_root})}")
+            return
+        cpus = ["cpu"]
+        if Config.cpu_load_sensors == 'cores':
+            cpus.extend(CpuLoadSensor.detect_cpus(procfs_root))
+        for cpu in cpus:
+            SensorManager.add_sensor(CpuLoadSensor(cpu, procfs_root))
+        LogManager.logger.info(f"CPU load sensors added {repr({'cpus': cpus})}")
 
     @staticmethod
-    def get_system_sensor(signature: list) -> Optional[Sensor]:
+    def identify_rapl_sensors(powercap_root: str):
+        for zone in RaplPowerSensor.detect_zones(powercap_root):
+            LogManager.logger.info(f"RAPL zone found {repr({'zone': zone.zone, 'name': zone.zone_name, 'max energy': zone.max_energy})}")
+            SensorManager.add_sensor(zone)
+
+    @staticmethod
+    def add_file_sensor(definition: Dict) -> Optional[FileSensor]:
+        name = definition.get('name')
+        path = definition.get('path')
+        if not name or not path:
+            LogManager.logger.warning(f"Invalid file sensor definition {repr(definition)}")
+            return None
+        try:
+            file_sensor = FileSensor(name, os.path.expanduser(path), float(definition.get('scale', 1.0)), float(definition.get('offset', 0.0)),
+                                     float(definition.get('min', 0.0)), float(definition.get('max', 100.0)))
+        except (TypeError, ValueError):
+            LogManager.logger.warning(f"Invalid file sensor definition {repr(definition)}")
+            return None
+        LogManager.logger.info(f"Adding file sensor {repr({'name': name, 'path': file_sensor.sensor_file})}")
+        SensorManager.add_sensor(file_sensor)
+        return file_sensor
+
+    @staticmethod
+    def add_virtual_sensor(definition: Dict) -> Optional[VirtualSensor]:
+        name = definition.get('name')
+        sources: List[Sensor] = list()
+        for source in definition.get('sources', []):
+            # sources are given either by the name or by the signature of a sensor
+            if isinstance(source, list):
+                sensor = SensorManager.get_system_sensor(source)
+            else:
+                sensor = next((s for s in SensorManager.system_sensors if s.get_name() == source), None)
+            if sensor is None:
+                LogManager.logger.warning(f"Source sensor of virtual sensor not found {repr({'sensor': name, 'source': source})}")
+                return None
+            sources.append(sensor)
+        if not name:
+            name = f"{definition.get('reducer', 'max')}({', '.join(sensor.get_name() for sensor in sources)})"
+        try:
+            virtual_sensor = VirtualSensor(name, sources, definition.get('reducer', 'max'), definition.get('weights'))
+        except ValueError as err:
+            LogManager.logger.warning(f"Invalid virtual sensor definition {repr({'sensor': name, 'error': str(err)})}")
+            return None
+        LogManager.logger.info(f"Adding virtual sensor {repr({'name': name, 'reducer': virtual_sensor.reducer, 'sources': [sensor.get_name() for sensor in sources]})}")
+        SensorManager.add_sensor(virtual_sensor)
+        return virtual_sensor
+
+    @staticmethod
+    def get_profile_sensor(signature: list) -> Optional[Sensor]:
+        # virtual sensors of a profile are re-created from their signature if they are not in the settings file
+        sensor = SensorManager.get_system_sensor(signature)
+        if sensor is None and signature and signature[0] == VirtualSensor.__name__:
+            sensor = SensorManager.add_virtual_sensor(VirtualSensor.definition_from_signature(signature))
+        return sensor
+
+    @staticmethod
+    def begin_tick():
+        NvidiaSensor.invalidate_status()
+
+    @staticmethod
+    def close_system_sensors():
         for sensor in SensorManager.system_sensors:
-            sensor_signature = sensor.get_signature()
-            if signature == sensor_signature:
-                return sensor
+            sensor.close()
+        NvidiaSensor.stop_status_stream()
+
+    @staticmethod
+    def add_sensor(sensor: Sensor) -> int:
+        SensorManager._update_index()
+        SensorManager.system_sensors.append(sensor)
+        return SensorManager._index_sensor(sensor)
+
+    @staticmethod
+    def get_system_sensor(signature: list) -> Optional[Sensor]:
+        SensorManager._update_index()
+        return SensorManager._signature_index.get(SensorManager.get_signature_key(signature))
+
+    @staticmethod
+    def get_sensor(sensor_id: int) -> Optional[Sensor]:
+        if 0 <= sensor_id < len(SensorManager.system_sensors):
+            return SensorManager.system_sensors[sensor_id]
         return None
 
+    @staticmethod
+    def get_sensor_id(sensor: Sensor) -> int:
+        SensorManager._update_index()
+        return SensorManager._sensor_ids.get(sensor, 0)
+
+    @staticmethod
+    def get_signature_key(signature: list) -> tuple:
+        # signatures are (nested) lists, so make them hashable
+        return tuple(SensorManager.get_signature_key(value) if isinstance(value, list) else value for value in signature)
 
+    @staticmethod
+    def _update_index():
+        # rebuild the index if the list of system sensors was replaced or changed outside of add_sensor
+        if SensorManager._indexed_sensors is not SensorManager.system_sensors or len(SensorManager._sensor_ids) != len(SensorManager.system_sensors):
+            SensorManager._indexed_sensors = SensorManager.system_sensors
+            SensorManager._signature_index = dict()
+            SensorManager._sensor_ids = dict()
+            for sensor in SensorManager.system_sensors:
+                SensorManager._index_sensor(sensor)
+
+    @staticmethod
+    def _index_sensor(sensor: Sensor) -> int:
+        sensor_id = len(SensorManager._sensor_ids)
+        SensorManager._sensor_ids[sensor] = sensor_id
+        # the first sensor with a signature wins, as with the former linear search
+        SensorManager._signature_index.setdefault(SensorManager.get_signature_key(sensor.get_signature()), sensor)
+        return sensor_id
@@ -1,7 +1,7 @@
 import os
 import logging
 from xdg.BaseDirectory import xdg_config_home, xdg_state_home
-from typing import Dict
+from typing import Dict, List
 
 import yaml
 
@@ -51,6 +51,44 @@ class Environment(object):
 
 class Config(object):
     interval: float = 10.0
+    sensor_discovery: str = 'libsensors'
+    nvidia_backend: str = 'query'
+    nvidia_period: float = 1.0
+    nvidia_timeout: float = 2.0
+    missed_tick_policy: str = 'skip'
+    adaptive_interval: bool = False
+    min_interval: float = 1.0
+    max_interval: float = 30.0
+    adaptive_slope: float = 0.5
+    watch_sensors: bool = False
+    watch_interval: float = 1.0
+    watch_thresholds: List[float] = []
+    parallel_controllers: bool = False
+    controller_deadline: float = 5.0
+    ramp_step: int = 10
+    ramp_duration: float = 0.25
+    device_status_ttl: float = 0.5
+    background_sampling: bool = False
+    sample_period_sysfs: float = 0.5
+    sample_period_device: float = 2.0
+    sample_period_gpu: float = 2.0
+    sample_buffer_size: int = 120
+    sample_smoothing: int = 1
+    sensor_latency_budget: float = 0.5
+    demotion_reads: int = 3
+    stale_timeout: float = 0.0
+    breaker_threshold: int = 3
+    breaker_delay: float = 2.0
+    breaker_max_delay: float = 120.0
+    statistics_interval: float = 300.0
+    virtual_sensors: List[Dict] = []
+    file_sensors: List[Dict] = []
+    cpu_load_sensors: str = 'total'
+    procfs_root: str = '/proc'
+    rapl_sensors: bool = True
+    powercap_root: str = '/sys/class/powercap'
+    commander_backend: str = 'liquidctl'
+    hwmon_root: str = '/sys/class/hwmon'
     auto_start: bool = False
     profile_file: str = ''
     log_level: int = logging.INFO
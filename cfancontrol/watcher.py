@@ -0,0 +1,89 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+from .sensor import Sensor
+from .log import LogManager
+
+
+class SensorWatcher(object):
+
+    def __init__(self, wakeup: Callable[[], None]) -> None:
+        self._wakeup = wakeup
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._thresholds: Dict[Sensor, List[float]] = dict()
+        self._last_temperatures: Dict[Sensor, float] = dict()
+        self._crossed_sensors: Set[Sensor] = set()
+        self._last_wakeup = 0.0
+        self._wakeup_pending = False
+        self.interval = 1.0
+        self.min_spacing = 1.0
+        self.wakeup_count = 0
+
+    def set_thresholds(self, thresholds: Dict[Sensor, List[float]]) -> None:
+        with self._lock:
+            self._thresholds = {sensor: sorted(set(values)) for sensor, values in thresholds.items() if values}
+            for sensor in list(self._last_temperatures):
+                if sensor not in self._thresholds:
+                    del self._last_temperatures[sensor]
+
+    def start(self, interval: float, min_spacing: float) -> None:
+        self.interval = interval
+        self.min_spacing = min_spacing
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="cfancontrol-watcher", daemon=True)
+            self._thread.start()
+            LogManager.logger.debug(f"Sensor watcher started {repr({'interval': interval})}")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            LogManager.logger.debug(f"Sensor watcher stopped {repr({'wakeups': self.wakeup_count})}")
+        with self._lock:
+            self._last_temperatures.clear()
+            self._crossed_sensors.clear()
+
+    def pop_crossed_sensors(self) -> Set[Sensor]:
+        # sensors that crossed a threshold since the last call
+        with self._lock:
+            crossed = self._crossed_sensors
+            self._crossed_sensors = set()
+            return crossed
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            with self._lock:
+                thresholds = dict(self._thresholds)
+            for sensor, values in thresholds.items():
+                temperature = sensor.read().value
+                with self._lock:
+                    last = self._last_temperatures.get(sensor)
+                    self._last_temperatures[sensor] = temperature
+                if last is not None and self._has_crossed(last, temperature, values):
+                    LogManager.logger.debug(f"Sensor crossed threshold {repr({'sensor': sensor.get_name(), 'last temp': last, 'new temp': temperature})}")
+                    with self._lock:
+                        self._crossed_sensors.add(sensor)
+                    self._wakeup_pending = True
+            now = time.monotonic()
+            if self._wakeup_pending and now - self._last_wakeup >= self.min_spacing:
+                self._wakeup_pending = False
+                self._last_wakeup = now
+                self.wakeup_count += 1
+                self._wakeup()
+
+    @staticmethod
+    def _has_crossed(last: float, temperature: float, thresholds: List[float]) -> bool:
+        low = min(last, temperature)
+        high = max(last, temperature)
+        for threshold in thresholds:
+            if low < threshold <= high:
+                return True
+        return False